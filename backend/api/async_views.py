@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .instrumentation import current_recorder
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=max(settings.ASYNC_READ_THREADS, 1),
+            thread_name_prefix='api-reads'
+        )
+    return _executor
+
+
+def run_read(view, request, *args, **kwargs):
+    """ Чтение целиком в потоке пула: запросы к базе, сериализация и
+    рендеринг JSON. Соединения потока закрываются, как в конце
+    обычного запроса. PerformanceMiddleware подключает замер SQL к
+    соединениям своего потока, поэтому здесь он подключается к
+    соединениям потока пула. """
+
+    close_old_connections()
+    recorder = current_recorder.get()
+    try:
+        with ExitStack() as stack:
+            if recorder is not None:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(recorder)
+                    )
+            response = view(request, *args, **kwargs)
+            if callable(getattr(response, 'render', None)):
+                response.render()
+            return response
+    finally:
+        close_old_connections()
+
+
+def concurrent_reads(view):
+    """ Асинхронная обёртка над вьюсетом DRF.
+
+    Под ASGI Django 3.2 выполняет синхронные представления по одному
+    в общем потоке, поэтому медленный запрос к базе задерживает
+    остальные. Асинхронного ORM (aget, aiterator) в Django 3.2 ещё нет,
+    так что GET и HEAD уходят в пул из ASYNC_READ_THREADS потоков
+    и выполняются параллельно, а цикл событий продолжает принимать
+    соединения. Изменяющие запросы выполняются как раньше.
+    """
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await sync_to_async(
+                run_read, thread_sensitive=False, executor=get_executor()
+            )(view, request, *args, **kwargs)
+        return await sync_to_async(view)(request, *args, **kwargs)
+
+    return wrapper
+
+
+def with_concurrent_reads(urlpatterns, viewsets):
+    """ Подменяет представления маршрутов роутера для viewsets,
+    если включён ASYNC_READ_VIEWS (по умолчанию под asgi.py) """
+
+    if settings.ASYNC_READ_VIEWS:
+        for pattern in urlpatterns:
+            if getattr(pattern.callback, 'cls', None) in viewsets:
+                pattern.callback = concurrent_reads(pattern.callback)
+    return urlpatterns
@@ -0,0 +1,153 @@
+from hashlib import md5
+from time import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+KEY_PREFIX = 'api-response'
+STATS_OUTCOMES = ('hit', 'miss', 'not_modified', 'modified')
+
+
+def response_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _incr(key):
+    cache = response_cache()
+    if cache.add(key, 1, None):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def generation_key(scope):
+    return f'{KEY_PREFIX}:gen:{scope}'
+
+
+def get_generations(scopes):
+    """ Текущие поколения областей кэша. Отсутствующее поколение
+    (первый запуск или вытеснение) заводится по текущему времени,
+    чтобы не совпасть со старыми ключами. """
+
+    cache = response_cache()
+    keys = [generation_key(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, int(time() * 1000), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def bump_generation(scope):
+    """ Инвалидирует все ответы области после фиксации транзакции """
+
+    transaction.on_commit(lambda: _incr(generation_key(scope)))
+
+
+def stats_key(name, outcome):
+    return f'{KEY_PREFIX}:stats:{name}:{outcome}'
+
+
+def cache_stats(names):
+    """ Счётчики по вьюсетам: попадания и промахи кэша ответов,
+    ответы 304 (not_modified) и полные ответы на условные GET """
+
+    cache = response_cache()
+    keys = {
+        (name, outcome): stats_key(name, outcome)
+        for name in names for outcome in STATS_OUTCOMES
+    }
+    values = cache.get_many(keys.values())
+    return {
+        name: {
+            outcome: values.get(keys[name, outcome], 0)
+            for outcome in STATS_OUTCOMES
+        }
+        for name in names
+    }
+
+
+def cached_viewset_names():
+    """ basename вьюсетов API, ответы которых кэшируются """
+
+    from .urls import router_v1
+
+    return [
+        basename for _, viewset, basename in router_v1.registry
+        if issubclass(viewset, CachedReadMixin)
+    ]
+
+
+def normalized_query(query_params):
+    """ Параметры запроса в каноническом виде: ключи и
+    множественные значения (tags) отсортированы """
+
+    return '&'.join(
+        f'{key}={value}'
+        for key in sorted(query_params)
+        for value in sorted(query_params.getlist(key))
+    )
+
+
+class CachedReadMixin:
+    """ Кэширование ответов list/retrieve для анонимных пользователей.
+
+    Ключ строится из пути, нормализованных параметров и поколений
+    областей cache_scopes; поколения увеличиваются сигналами при
+    изменении данных, поэтому старые записи просто перестают читаться.
+    """
+
+    cache_scopes = ()
+    # Поля сортировки, которые меняются через update() без post_save:
+    # страницы с такой сортировкой не кэшируются
+    uncached_ordering = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def response_cache_key(self, request):
+        generations = get_generations(self.cache_scopes)
+        raw = (
+            f'{request.path}?{normalized_query(request.query_params)}'
+            f'#{generations}'
+        )
+        digest = md5(raw.encode()).hexdigest()
+        return f'{KEY_PREFIX}:{self.basename}:{digest}'
+
+    def is_cacheable(self, request):
+        if not request.user.is_anonymous:
+            return False
+        ordering = request.query_params.get(api_settings.ORDERING_PARAM, '')
+        return not any(
+            field.strip().lstrip('-') in self.uncached_ordering
+            for field in ordering.split(',')
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return handler(request, *args, **kwargs)
+        cache = response_cache()
+        key = self.response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            _incr(stats_key(self.basename, 'hit'))
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        _incr(stats_key(self.basename, 'miss'))
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
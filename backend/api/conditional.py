@@ -0,0 +1,76 @@
+from hashlib import md5
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from .cache import _incr, get_generations, normalized_query, stats_key
+from .relations import relations_scopes
+
+
+class ConditionalReadMixin:
+    """ ETag для list/retrieve, Last-Modified для retrieve.
+
+    Версия рецепта - updated_at и revision, их поднимает правка. Версия
+    списка - поколения list_version_scopes кэша ответов: они растут при
+    любом изменении рецептов и счётчиков, и запроса к базе для неё не
+    нужно. ETag дополнительно учитывает параметры запроса, поколения
+    version_scopes (переименование тегов, ингредиентов, авторов) и
+    версию избранного, корзины и подписок пользователя из api.relations,
+    поэтому 304 отдаётся до запуска сериализатора.
+    """
+
+    version_scopes = ()
+    list_version_scopes = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            None, get_generations(self.list_version_scopes),
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        try:
+            version = self.queryset.model.objects.filter(
+                **{self.lookup_field: kwargs[lookup]}
+            ).values_list('updated_at', 'revision').first()
+        except (TypeError, ValueError):
+            # Некорректный pk: 404 отдаст get_object_or_404 из DRF
+            version = None
+        if version is None:
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(
+            *version, super().retrieve, request, *args, **kwargs
+        )
+
+    def response_etag(self, request, revision):
+        scopes = self.version_scopes
+        if not request.user.is_anonymous:
+            scopes += relations_scopes(request.user.pk)
+        raw = (
+            f'{request.path}?{normalized_query(request.query_params)}'
+            f'#{request.user.pk}#{revision}#{get_generations(scopes)}'
+        )
+        return f'"{md5(raw.encode()).hexdigest()}"'
+
+    def conditional_response(self, updated_at, revision, handler, request,
+                             *args, **kwargs):
+        etag = self.response_etag(request, f'{updated_at}:{revision}')
+        last_modified = (
+            int(updated_at.timestamp()) if updated_at is not None else None
+        )
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is not None:
+            _incr(stats_key(self.basename, 'not_modified'))
+        else:
+            _incr(stats_key(self.basename, 'modified'))
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        return response
@@ -0,0 +1,213 @@
+import csv
+import json
+
+SHOPPING_LIST_TITLE = 'Купить в магазине:'
+
+PDF_PAGE_WIDTH = 595
+PDF_PAGE_HEIGHT = 842
+PDF_MARGIN = 50
+PDF_FONT_SIZE = 12
+PDF_LEADING = 16
+PDF_LINES_PER_PAGE = (
+    (PDF_PAGE_HEIGHT - 2 * PDF_MARGIN) // PDF_LEADING
+)
+
+
+def render_txt(rows):
+    """ Список покупок построчно в текстовом виде """
+
+    yield f'{SHOPPING_LIST_TITLE}\n'
+    for row in rows:
+        yield f'{row["name"]}: {row["total"]}{row["units"]}.\n'
+
+
+class _Echo:
+    """ Буфер для csv.writer, возвращающий записанную строку """
+
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    """ Список покупок в формате CSV """
+
+    writer = csv.writer(_Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for row in rows:
+        yield writer.writerow((row['name'], row['units'], row['total']))
+
+
+def render_json(rows):
+    """ Список покупок JSON-массивом, по одному объекту на строку """
+
+    separator = '\n'
+    yield '['
+    for row in rows:
+        yield separator + json.dumps(
+            {
+                'name': row['name'],
+                'measurement_unit': row['units'],
+                'amount': row['total'],
+            },
+            ensure_ascii=False
+        )
+        separator = ',\n'
+    yield '\n]\n'
+
+
+def _cyrillic_glyph_name(char):
+    """ Имя глифа Adobe для русской буквы """
+
+    if char == 'Ё':
+        return 'afii10023'
+    if char == 'ё':
+        return 'afii10071'
+    if 'А' <= char <= 'Е':
+        return f'afii{10017 + ord(char) - ord("А")}'
+    if 'Ж' <= char <= 'Я':
+        return f'afii{10024 + ord(char) - ord("Ж")}'
+    if 'а' <= char <= 'е':
+        return f'afii{10065 + ord(char) - ord("а")}'
+    if 'ж' <= char <= 'я':
+        return f'afii{10072 + ord(char) - ord("ж")}'
+    return None
+
+
+def _pdf_differences():
+    """ Переопределение кодов 128-255 (cp1251) на кириллические глифы """
+
+    differences = []
+    for code in range(128, 256):
+        char = bytes((code,)).decode('cp1251', errors='ignore')
+        glyph = _cyrillic_glyph_name(char) if char else None
+        if glyph:
+            differences.append(f'{code} /{glyph}')
+    return ' '.join(differences)
+
+
+def _pdf_text(text):
+    """ Строка PDF в кодировке cp1251 с экранированием """
+
+    encoded = text.encode('cp1251', errors='replace')
+    return (
+        encoded.replace(b'\\', b'\\\\')
+        .replace(b'(', b'\\(')
+        .replace(b')', b'\\)')
+    )
+
+
+class _PDFWriter:
+    """ Последовательная запись объектов PDF с учётом смещений для xref """
+
+    def __init__(self):
+        self.offset = 0
+        self.offsets = {}
+
+    def raw(self, data):
+        self.offset += len(data)
+        return data
+
+    def obj(self, number, body):
+        self.offsets[number] = self.offset
+        return self.raw(
+            b'%d 0 obj\n' % number + body + b'\nendobj\n'
+        )
+
+    def stream(self, number, content):
+        return self.obj(
+            number,
+            b'<< /Length %d >>\nstream\n' % len(content)
+            + content + b'\nendstream'
+        )
+
+    def xref(self, size):
+        start = self.offset
+        lines = [b'xref\n0 %d\n' % size, b'0000000000 65535 f \n']
+        lines.extend(
+            b'%010d 00000 n \n' % self.offsets[number]
+            for number in range(1, size)
+        )
+        lines.append(
+            b'trailer\n<< /Size %d /Root 1 0 R >>\n'
+            b'startxref\n%d\n%%%%EOF\n' % (size, start)
+        )
+        return self.raw(b''.join(lines))
+
+
+def _pdf_pages(lines):
+    """ Разбивает строки на страницы без накопления всего списка """
+
+    page = []
+    for line in lines:
+        page.append(line)
+        if len(page) == PDF_LINES_PER_PAGE:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def _pdf_page_content(lines):
+    content = [
+        b'BT /F1 %d Tf %d TL %d %d Td' % (
+            PDF_FONT_SIZE, PDF_LEADING,
+            PDF_MARGIN, PDF_PAGE_HEIGHT - PDF_MARGIN
+        )
+    ]
+    content.extend(b'(' + _pdf_text(line) + b') Tj T*' for line in lines)
+    content.append(b'ET')
+    return b'\n'.join(content)
+
+
+def render_pdf(rows):
+    """ Список покупок в PDF без сторонних библиотек.
+
+    Объекты страниц пишутся по мере чтения строк из базы, дерево
+    страниц и таблица xref - в конце файла. Шрифт - стандартный
+    Helvetica с кириллицей через /Differences.
+    """
+
+    writer = _PDFWriter()
+    yield writer.raw(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    yield writer.obj(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+    yield writer.obj(
+        3,
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+        b'/Encoding 4 0 R >>'
+    )
+    yield writer.obj(
+        4,
+        b'<< /Type /Encoding /BaseEncoding /WinAnsiEncoding '
+        b'/Differences [' + _pdf_differences().encode() + b'] >>'
+    )
+    lines = (
+        line.rstrip('\n') for line in render_txt(rows)
+    )
+    kids = []
+    number = 5
+    for page in _pdf_pages(lines):
+        yield writer.stream(number, _pdf_page_content(page))
+        yield writer.obj(
+            number + 1,
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 3 0 R >> >> '
+            b'/Contents %d 0 R >>' % (
+                PDF_PAGE_WIDTH, PDF_PAGE_HEIGHT, number
+            )
+        )
+        kids.append(b'%d 0 R' % (number + 1))
+        number += 2
+    yield writer.obj(
+        2,
+        b'<< /Type /Pages /Kids [' + b' '.join(kids)
+        + b'] /Count %d >>' % len(kids)
+    )
+    yield writer.xref(number)
+
+
+EXPORTERS = {
+    'txt': ('text/plain; charset=utf-8', render_txt),
+    'csv': ('text/csv; charset=utf-8', render_csv),
+    'json': ('application/json', render_json),
+    'pdf': ('application/pdf', render_pdf),
+}
@@ -0,0 +1,114 @@
+import base64
+import binascii
+import uuid
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image, UnidentifiedImageError
+from rest_framework import serializers
+
+# Размер куска base64 в символах, кратен 4
+BASE64_CHUNK = 64 * 1024
+# Сколько первых байт проверять на заголовок изображения
+HEADER_PROBE_LIMIT = 256 * 1024
+BASE64_MARKER = ';base64,'
+IMAGE_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif'}
+
+
+class StreamingImageField(serializers.ImageField):
+    """ Изображение строкой base64 (data URL) или файлом multipart.
+    base64 декодируется кусками во временный файл, а размер в байтах
+    и в пикселях проверяется до полного декодирования. """
+
+    default_error_messages = {
+        'invalid_base64': 'Изображение должно быть строкой base64 '
+                          'или файлом.',
+        'too_large': 'Размер изображения не более {max_bytes} байт.',
+        'too_many_pixels': 'Изображение не более {max_pixels} пикселей.',
+        'unsupported': 'Допустимы изображения JPEG, PNG и GIF.',
+    }
+
+    def to_internal_value(self, data):
+        if data == '':
+            self.fail('required')
+        if isinstance(data, str):
+            upload = self.decode_base64(data)
+        elif hasattr(data, 'seek'):
+            if data.size > settings.IMAGE_UPLOAD_MAX_BYTES:
+                self.fail(
+                    'too_large', max_bytes=settings.IMAGE_UPLOAD_MAX_BYTES
+                )
+            upload = data
+            self.rename(upload, self.require_format(upload))
+        else:
+            upload = data
+        return super().to_internal_value(upload)
+
+    def decode_base64(self, data):
+        start = data.find(BASE64_MARKER, 0, 100)
+        start = 0 if start < 0 else start + len(BASE64_MARKER)
+        if (len(data) - start) * 3 // 4 > settings.IMAGE_UPLOAD_MAX_BYTES:
+            self.fail('too_large', max_bytes=settings.IMAGE_UPLOAD_MAX_BYTES)
+        upload = TemporaryUploadedFile('image', None, 0, None)
+        try:
+            image_format, carry = None, ''
+            for offset in range(start, len(data), BASE64_CHUNK):
+                chunk = carry + ''.join(
+                    data[offset:offset + BASE64_CHUNK].split()
+                )
+                usable = len(chunk) - len(chunk) % 4
+                carry = chunk[usable:]
+                upload.write(base64.b64decode(chunk[:usable], validate=True))
+                if image_format is None and upload.tell() <= (
+                        HEADER_PROBE_LIMIT):
+                    image_format = self.probe(upload)
+            if carry:
+                self.fail('invalid_base64')
+            upload.size = upload.tell()
+            image_format = image_format or self.require_format(upload)
+        except binascii.Error:
+            upload.close()
+            self.fail('invalid_base64')
+        except serializers.ValidationError:
+            upload.close()
+            raise
+        self.rename(upload, image_format)
+        upload.seek(0)
+        return upload
+
+    @staticmethod
+    def rename(upload, image_format):
+        upload.name = f'{uuid.uuid4()}.{IMAGE_EXTENSIONS[image_format]}'
+        upload.content_type = Image.MIME[image_format]
+
+    def probe(self, file):
+        """ Формат по заголовку файла или None, если заголовок ещё
+        не дописан. Слишком большое изображение отклоняется сразу. """
+
+        position = file.tell()
+        file.seek(0)
+        try:
+            with Image.open(file) as image:
+                width, height = image.size
+                image_format = image.format
+        except Image.DecompressionBombError:
+            self.fail(
+                'too_many_pixels', max_pixels=settings.IMAGE_UPLOAD_MAX_PIXELS
+            )
+        except (UnidentifiedImageError, OSError, SyntaxError):
+            return None
+        finally:
+            file.seek(position)
+        if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+            self.fail(
+                'too_many_pixels', max_pixels=settings.IMAGE_UPLOAD_MAX_PIXELS
+            )
+        if image_format not in IMAGE_EXTENSIONS:
+            self.fail('unsupported')
+        return image_format
+
+    def require_format(self, file):
+        image_format = self.probe(file)
+        if image_format is None:
+            self.fail('invalid_image')
+        return image_format
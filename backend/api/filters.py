@@ -1,24 +1,73 @@
+from django import forms
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import OrderingFilter, SearchFilter
 
 from recipes.models import Recipe, Tag, Ingredient
+from recipes.search import search_recipes
+
+TAG_SLUGS_CACHE_KEY = 'tag-slugs'
+
+
+def tag_ids_by_slug(refresh=False):
+    """ Словарь slug -> id тегов из кэша """
+
+    slugs = None if refresh else cache.get(TAG_SLUGS_CACHE_KEY)
+    if slugs is None:
+        slugs = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(TAG_SLUGS_CACHE_KEY, slugs, settings.TAG_SLUGS_TIMEOUT)
+    return slugs
+
+
+class TagSlugsField(forms.MultipleChoiceField):
+    """ Проверка slug по кэшированному словарю; неизвестный slug
+    перечитывает словарь из базы на случай нового тега """
+
+    def valid_value(self, value):
+        return (
+            value in tag_ids_by_slug()
+            or value in tag_ids_by_slug(refresh=True)
+        )
+
+
+class TagSlugsFilter(filters.MultipleChoiceFilter):
+    field_class = TagSlugsField
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
-    )
+    tags = TagSlugsFilter(method='filter_tags')
     is_favorited = filters.NumberFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.NumberFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
         fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',)
 
+    def filter_tags(self, queryset, name, value):
+        """Полусоединение EXISTS вместо JOIN по тегам: рецепт
+        не дублируется при нескольких тегах и не нужен DISTINCT."""
+
+        slugs = tag_ids_by_slug()
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe_id=OuterRef('pk'),
+                tag_id__in=[slugs[slug] for slug in value if slug in slugs]
+            )
+        ))
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск по названию, описанию и
+        ингредиентам; без явной сортировки - по рангу совпадения."""
+
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
+
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
             return queryset.filter(favorites__user=self.request.user)
@@ -36,3 +85,14 @@ class IngredientNameFilter(SearchFilter):
     class Meta:
         model = Ingredient
         fields = ('name',)
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """ Сортировка рецептов по счётчикам популярности с
+    дополнительной сортировкой по дате для стабильной пагинации """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        return (*ordering, '-pub_date', '-id')
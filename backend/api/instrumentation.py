@@ -0,0 +1,210 @@
+import json
+import logging
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+from statistics import quantiles
+from threading import Lock
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('api.performance')
+
+current_recorder = ContextVar('current_recorder', default=None)
+
+HISTOGRAM_BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+PLACEHOLDER_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+NUMBER = re.compile(r'\b\d+\b')
+
+
+def fingerprint(sql):
+    """ Запрос без значений: списки IN и числа схлопываются,
+    чтобы одинаковые по форме запросы совпадали """
+
+    return NUMBER.sub('N', PLACEHOLDER_LIST.sub('(...)', sql))
+
+
+class QueryRecorder:
+    """ Обёртка для connection.execute_wrapper: считает запросы,
+    время SQL, число строк (если драйвер сообщает rowcount)
+    и повторы одинаковых по форме запросов. """
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.rows = 0
+        self.rows_known = True
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - started
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+            rowcount = getattr(context['cursor'], 'rowcount', -1)
+            if rowcount is None or rowcount < 0:
+                self.rows_known = False
+            else:
+                self.rows += rowcount
+
+    def duplicates(self):
+        """ Запросы, повторившиеся не меньше PERF_DUPLICATE_THRESHOLD
+        раз за запрос: типичный признак N+1 """
+
+        return {
+            sql: count for sql, count in self.fingerprints.items()
+            if count >= settings.PERF_DUPLICATE_THRESHOLD
+        }
+
+
+class EndpointStats:
+    """ Скользящее окно последних замеров по эндпоинтам процесса """
+
+    def __init__(self, window):
+        self.lock = Lock()
+        self.samples = defaultdict(lambda: deque(maxlen=window))
+        self.duplicates = defaultdict(Counter)
+
+    def add(self, endpoint, sample, duplicates):
+        with self.lock:
+            self.samples[endpoint].append(sample)
+            self.duplicates[endpoint].update(duplicates)
+
+    def snapshot(self):
+        with self.lock:
+            samples = {
+                endpoint: list(values)
+                for endpoint, values in self.samples.items()
+            }
+            duplicates = {
+                endpoint: counter.most_common(5)
+                for endpoint, counter in self.duplicates.items()
+            }
+        return {
+            endpoint: summarize(values, duplicates.get(endpoint, []))
+            for endpoint, values in sorted(samples.items())
+        }
+
+
+def summarize(samples, duplicates):
+    totals = [sample['total_ms'] for sample in samples]
+    histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+    for total in totals:
+        histogram[bisect_left(HISTOGRAM_BOUNDS_MS, total)] += 1
+    percentiles = (
+        quantiles(totals, n=100, method='inclusive')
+        if len(totals) > 1 else totals * 99
+    )
+    return {
+        'count': len(samples),
+        'p50_ms': round(percentiles[49], 3),
+        'p95_ms': round(percentiles[94], 3),
+        'p99_ms': round(percentiles[98], 3),
+        'avg_queries': round(
+            sum(sample['queries'] for sample in samples) / len(samples), 2
+        ),
+        'avg_sql_ms': round(
+            sum(sample['sql_ms'] for sample in samples) / len(samples), 3
+        ),
+        'histogram_ms': dict(zip(
+            [f'<={bound}' for bound in HISTOGRAM_BOUNDS_MS]
+            + [f'>{HISTOGRAM_BOUNDS_MS[-1]}'],
+            histogram
+        )),
+        'duplicate_queries': [
+            {'sql': sql, 'count': count} for sql, count in duplicates
+        ],
+    }
+
+
+endpoint_stats = EndpointStats(settings.PERF_WINDOW)
+
+
+class PerformanceMiddleware:
+    """ Замеры на запрос: число и время SQL, повторяющиеся запросы,
+    время кода вьюсета без SQL. Включается настройкой
+    PERF_INSTRUMENTATION; результаты идут в заголовок Server-Timing,
+    в лог api.performance и в /api/_perf/. """
+
+    def __init__(self, get_response):
+        if not settings.PERF_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        started = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        total_ms = (perf_counter() - started) * 1000
+        sql_ms = recorder.sql_time * 1000
+        view_ms = getattr(request, 'perf_view_ms', None)
+        duplicates = recorder.duplicates()
+        endpoint = getattr(request, 'perf_endpoint', None) or 'unresolved'
+
+        timings = [
+            f'total;dur={total_ms:.2f}',
+            f'sql;dur={sql_ms:.2f};desc="{recorder.queries} queries"',
+        ]
+        if view_ms is not None:
+            timings.append(f'serialize;dur={view_ms:.2f}')
+        response['Server-Timing'] = ', '.join(timings)
+
+        sample = {
+            'total_ms': round(total_ms, 3),
+            'sql_ms': round(sql_ms, 3),
+            'queries': recorder.queries,
+        }
+        endpoint_stats.add(endpoint, sample, duplicates)
+        logger.info(json.dumps({
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **sample,
+            'serialize_ms': None if view_ms is None else round(view_ms, 3),
+            'duplicate_queries': sum(duplicates.values()),
+        }, ensure_ascii=False))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        actions = getattr(view_func, 'actions', None) or {}
+        name = view_class.__name__ if view_class else view_func.__name__
+        action = actions.get(request.method.lower())
+        request.perf_endpoint = f'{name}.{action}' if action else name
+
+
+class InstrumentedViewMixin:
+    """ Время обработчика вьюсета за вычетом SQL - в основном
+    это построение ответа сериализаторами """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        recorder = current_recorder.get()
+        if recorder is not None:
+            self.perf_started = (perf_counter(), recorder.sql_time)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        recorder = current_recorder.get()
+        started = getattr(self, 'perf_started', None)
+        if recorder is not None and started is not None:
+            elapsed = perf_counter() - started[0]
+            sql = recorder.sql_time - started[1]
+            request._request.perf_view_ms = (elapsed - sql) * 1000
+        return super().finalize_response(request, response, *args, **kwargs)
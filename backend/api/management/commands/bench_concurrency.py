@@ -0,0 +1,129 @@
+import asyncio
+from statistics import quantiles
+from time import perf_counter
+from urllib.parse import quote, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?page=2',
+    '/api/tags/',
+    '/api/ingredients/?name=сол',
+)
+
+
+async def read_response(reader):
+    """ Статус и признак keep-alive ответа HTTP/1.1 """
+
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('соединение закрыто')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    else:
+        await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers.get('connection') != 'close'
+
+
+async def client(host, port, paths, queue, timings, errors):
+    """ Одно соединение: запросы подряд, переподключение, если
+    сервер закрыл соединение (синхронные воркеры gunicorn) """
+
+    reader = writer = None
+    while True:
+        try:
+            number = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+        path = quote(paths[number % len(paths)], safe='/?=&%')
+        started = perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(
+                f'GET {path} HTTP/1.1\r\nHost: {host}\r\n'
+                'Accept: application/json\r\n\r\n'.encode()
+            )
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            errors.append('connection')
+            status, keep_alive = None, False
+        else:
+            timings.append(perf_counter() - started)
+            if status != 200:
+                errors.append(status)
+        if not keep_alive and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(url, paths, concurrency, requests):
+    parts = urlsplit(url)
+    queue = asyncio.Queue()
+    for number in range(requests):
+        queue.put_nowait(number)
+    timings, errors = [], []
+    started = perf_counter()
+    await asyncio.gather(*(
+        client(parts.hostname, parts.port or 80, paths, queue, timings,
+               errors)
+        for _ in range(concurrency)
+    ))
+    return perf_counter() - started, timings, errors
+
+
+class Command(BaseCommand):
+    help = (' Нагрузить запущенные серверы параллельными GET-запросами '
+            'и сравнить пропускную способность ')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'targets', nargs='+',
+            help='Серверы в виде имя=url, например wsgi=http://127.0.0.1:8001'
+        )
+        parser.add_argument('--concurrency', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--paths', nargs='*', default=PATHS)
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['targets']:
+            name, _, url = target.partition('=')
+            if not url:
+                raise CommandError(f'Ожидается имя=url: {target}')
+            targets.append((name, url))
+
+        self.stdout.write(
+            f'Соединений: {options["concurrency"]}, '
+            f'запросов: {options["requests"]}'
+        )
+        for name, url in targets:
+            elapsed, timings, errors = asyncio.run(run_load(
+                url, options['paths'], options['concurrency'],
+                options['requests']
+            ))
+            if len(timings) < 2:
+                raise CommandError(f'{name}: сервер {url} не отвечает')
+            percentiles = quantiles(timings, n=100)
+            self.stdout.write(
+                f'{name:<8} {len(timings) / elapsed:8.1f} rps   '
+                f'p50 {percentiles[49] * 1000:8.1f} ms   '
+                f'p95 {percentiles[94] * 1000:8.1f} ms   '
+                f'ошибок {len(errors)}'
+            )
@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+from statistics import mean, quantiles
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def report(name, timings):
+    p95 = quantiles(timings, n=100)[94] if len(timings) > 1 else timings[0]
+    return (
+        f'{name:<22} mean {mean(timings) * 1000:8.3f} ms   '
+        f'p95 {p95 * 1000:8.3f} ms'
+    )
+
+
+def run_requests(alias, requests, persistent):
+    """ Имитация запросов: соединение (новое или постоянное) и SELECT 1.
+    Возвращает время установки соединений и время запросов. """
+
+    connect_timings, query_timings = [], []
+    connection = None
+    try:
+        for _ in range(requests):
+            started = perf_counter()
+            if connection is None:
+                connection = connections.create_connection(alias)
+                connection.ensure_connection()
+                connect_timings.append(perf_counter() - started)
+            started = perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            query_timings.append(perf_counter() - started)
+            if not persistent:
+                connection.close()
+                connection = None
+    finally:
+        if connection is not None:
+            connection.close()
+    return connect_timings, query_timings
+
+
+class Command(BaseCommand):
+    help = (' Замерить установку соединений с базой и ожидание в пуле '
+            '(PgBouncer) при параллельных запросах ')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument(
+            '--threads', type=int, default=20,
+            help='Параллельные потоки; больше размера пула PgBouncer, '
+                 'чтобы увидеть ожидание свободного соединения'
+        )
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        settings_dict = connections[alias].settings_dict
+        self.stdout.write(
+            f'{settings_dict["ENGINE"]} {settings_dict["HOST"]}:'
+            f'{settings_dict["PORT"]}, CONN_MAX_AGE '
+            f'{settings_dict["CONN_MAX_AGE"]}'
+        )
+        for persistent in (False, True):
+            mode = 'persistent' if persistent else 'per request'
+            connect, query = run_requests(
+                alias, options['requests'], persistent
+            )
+            self.stdout.write(report(f'connect ({mode})', connect))
+            self.stdout.write(report(f'query ({mode})', query))
+
+        # Под нагрузкой PgBouncer в режиме transaction держит клиентов
+        # в очереди до освобождения серверного соединения: ожидание
+        # видно как рост времени запроса относительно одного потока
+        threads = options['threads']
+        per_thread = max(options['requests'] // threads, 1)
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(
+                lambda _: run_requests(alias, per_thread, False),
+                range(threads)
+            ))
+        connect = [value for timings, _ in results for value in timings]
+        query = [value for _, timings in results for value in timings]
+        self.stdout.write(report(f'connect ({threads} threads)', connect))
+        self.stdout.write(report(f'query ({threads} threads)', query))
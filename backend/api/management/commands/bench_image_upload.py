@@ -0,0 +1,127 @@
+import base64
+import gc
+import subprocess
+import sys
+from io import BytesIO
+from random import Random
+from tempfile import NamedTemporaryFile
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from PIL import Image
+from rest_framework import serializers
+
+from api.fields import StreamingImageField
+
+
+def make_image(megapixels, seed):
+    """ JPEG с шумом, чтобы он плохо сжимался, как настоящее фото """
+
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    noise = Image.frombytes(
+        'L', (width // 8, height // 8),
+        Random(seed).randbytes(width // 8 * (height // 8))
+    )
+    image = Image.merge('RGB', (noise, noise.rotate(90), noise)).resize(
+        (width, height)
+    )
+    output = BytesIO()
+    image.save(output, 'JPEG', quality=95)
+    return output.getvalue()
+
+
+def decode_at_once(data):
+    """ Прежний путь: строка декодируется целиком в памяти """
+
+    decoded = base64.b64decode(data.split(';base64,')[1])
+    upload = SimpleUploadedFile('image.jpg', decoded, 'image/jpeg')
+    return serializers.ImageField().to_internal_value(upload)
+
+
+def decode_streaming(data):
+    return StreamingImageField().to_internal_value(data)
+
+
+DECODERS = {'целиком': decode_at_once, 'потоково': decode_streaming}
+
+# Дочерний процесс: только Django, строка base64 и один декодер
+CHILD = (
+    'import sys, django; django.setup(); '
+    'from api.management.commands.bench_image_upload import measure; '
+    'print(measure(*sys.argv[1:]))'
+)
+
+
+def data_url(image):
+    return 'data:image/jpeg;base64,' + base64.b64encode(image).decode()
+
+
+def current_peak_rss():
+    """ Пик RSS процесса в байтах (VmHWM). ru_maxrss не подходит:
+    после exec он не меньше RSS родителя, запустившего процесс. """
+
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) * 1024
+    raise OSError('В /proc/self/status нет VmHWM')
+
+
+def reset_peak_rss():
+    """ Сбрасывает пик RSS до текущего RSS (Linux 4.0+) """
+
+    with open('/proc/self/clear_refs', 'w') as clear_refs:
+        clear_refs.write('5')
+
+
+def measure(decoder, path):
+    """ Прирост пика RSS при декодировании уже прочитанной строки """
+
+    decode = DECODERS[decoder]
+    # Прогрев: импорт плагинов Pillow не относится к загрузке
+    decode(data_url(make_image(0.05, 0))).close()
+    with open(path, encoding='ascii') as file:
+        data = file.read()
+    gc.collect()
+    reset_peak_rss()
+    before = current_peak_rss()
+    decode(data).close()
+    return current_peak_rss() - before
+
+
+def peak_rss_growth(image):
+    """ {декодер: прирост пика RSS в байтах}, каждый декодер в
+    отдельном процессе, чтобы пики не влияли друг на друга """
+
+    with NamedTemporaryFile('w', suffix='.b64', encoding='ascii') as file:
+        file.write(data_url(image))
+        file.flush()
+        return {
+            decoder: int(subprocess.run(
+                (sys.executable, '-c', CHILD, decoder, file.name),
+                cwd=settings.BASE_DIR, check=True, capture_output=True,
+                text=True
+            ).stdout)
+            for decoder in DECODERS
+        }
+
+
+class Command(BaseCommand):
+    help = ' Сравнить пиковый RSS при загрузке изображения base64 '
+
+    def add_arguments(self, parser):
+        parser.add_argument('--megapixels', type=float, default=12)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        image = make_image(options['megapixels'], options['seed'])
+        self.stdout.write(
+            f'Изображение: {len(image) / 2 ** 20:.1f} MiB, '
+            f'base64: {len(data_url(image)) / 2 ** 20:.1f} MiB'
+        )
+        for decoder, growth in peak_rss_growth(image).items():
+            self.stdout.write(
+                f'{decoder:<10} прирост пика RSS {growth / 2 ** 20:8.2f} MiB'
+            )
@@ -0,0 +1,84 @@
+from statistics import median
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.flat_list import RECIPE_FIELDS, flat_recipes
+from api.renderers import ORJSONRenderer
+from api.serializers import ReadRecipeSerializer
+from recipes.models import Recipe
+from users.models import User
+
+
+def timed(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = perf_counter()
+        func()
+        timings.append(perf_counter() - started)
+    return median(timings)
+
+
+class Command(BaseCommand):
+    help = (
+        ' Сравнить страницу рецептов: ReadRecipeSerializer + JSONRenderer '
+        'и flat_recipes + ORJSONRenderer '
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=30,
+                            help='Рецептов на странице')
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--user', help='username для флагов избранного')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f'Нет пользователя {options["user"]}')
+        limit = options['limit']
+        factory = RequestFactory()
+
+        def context():
+            request = Request(factory.get('/api/recipes/'))
+            if user is not None:
+                request.user = user
+            return {'request': request}
+
+        def serializer_page():
+            page = list(Recipe.objects.for_read()[:limit])
+            data = ReadRecipeSerializer(
+                page, many=True, context=context()
+            ).data
+            return JSONRenderer().render(data)
+
+        def flat_page():
+            page = Recipe.objects.values(*RECIPE_FIELDS)[:limit]
+            return ORJSONRenderer().render(flat_recipes(page, context()))
+
+        expected = serializer_page()
+        if flat_page() != expected:
+            raise CommandError(
+                'Вывод flat_recipes отличается от сериализатора'
+            )
+        self.stdout.write(
+            f'Рецептов на странице: {Recipe.objects.all()[:limit].count()}, '
+            f'ответ {len(expected)} байт, вывод совпадает'
+        )
+        for name, func in (
+            ('serializer + json', serializer_page),
+            ('flat + orjson', flat_page),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                func()
+            elapsed = timed(options['repeat'], func)
+            self.stdout.write(
+                f'{name:<20} {elapsed * 1000:8.2f} ms   '
+                f'запросов {len(queries)}'
+            )
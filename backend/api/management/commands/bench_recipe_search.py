@@ -0,0 +1,82 @@
+from random import Random
+from statistics import median, quantiles
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from recipes.models import Recipe
+from recipes.search import WORD, get_search_index, search_recipes
+
+
+def naive_search(queryset, text):
+    """ Поиск без индекса: ILIKE по каждому полю и JOIN ингредиентов """
+
+    condition = Q()
+    for word in text.split():
+        condition &= (
+            Q(name__icontains=word) | Q(text__icontains=word)
+            | Q(ingredients__name__icontains=word)
+        )
+    return queryset.filter(condition).distinct()
+
+
+class Command(BaseCommand):
+    help = ' Сравнить полнотекстовый поиск рецептов с поиском ILIKE '
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=30)
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        words = self.sample_words(options['queries'], options['seed'])
+        if not words:
+            raise CommandError('Нет рецептов, выполните seed_bench')
+        engine = 'PostgreSQL tsvector'
+        if connection.vendor != 'postgresql':
+            started = perf_counter()
+            get_search_index()
+            engine = (
+                f'индекс в памяти, построен за '
+                f'{perf_counter() - started:.2f} с'
+            )
+        self.stdout.write(
+            f'Рецептов: {Recipe.objects.count()}, запросов: {len(words)}, '
+            f'движок: {engine}'
+        )
+        for name, search in (
+            ('полнотекстовый', search_recipes), ('ILIKE', naive_search)
+        ):
+            timings, found = [], []
+            for text in words:
+                began = perf_counter()
+                queryset = search(Recipe.objects.all(), text)
+                found.append(queryset.count())
+                list(queryset[:options['limit']])
+                timings.append((perf_counter() - began) * 1000)
+            p95 = (
+                quantiles(timings, n=100, method='inclusive')[94]
+                if len(timings) > 1 else timings[0]
+            )
+            self.stdout.write(
+                f'{name:<16} медиана {median(timings):8.2f} ms   '
+                f'p95 {p95:8.2f} ms   найдено в среднем '
+                f'{sum(found) / len(found):.1f}'
+            )
+
+    @staticmethod
+    def sample_words(count, seed):
+        """ Слова из названий случайных рецептов и их ингредиентов """
+
+        random = Random(seed)
+        ids = list(Recipe.objects.values_list('pk', flat=True)[:5000])
+        words = []
+        for pk in random.sample(ids, min(count, len(ids))):
+            recipe = Recipe.objects.prefetch_related('ingredients').get(pk=pk)
+            candidates = WORD.findall(recipe.name) + [
+                ingredient.name for ingredient in recipe.ingredients.all()
+            ]
+            words.append(random.choice(candidates))
+        return words
@@ -0,0 +1,108 @@
+from itertools import combinations
+from statistics import median
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.filters import RecipeFilter
+from recipes.models import Recipe, Tag
+from users.models import User
+
+BATCH_SIZE = 5000
+
+
+def timed(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = perf_counter()
+        func()
+        timings.append(perf_counter() - started)
+    return median(timings)
+
+
+class Command(BaseCommand):
+    help = ' Сравнить фильтрацию рецептов по тегам: JOIN + DISTINCT и EXISTS '
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Сколько синтетических рецептов добавить перед замером'
+        )
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=6)
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'], options['tags_per_recipe'])
+        slugs = list(Tag.objects.values_list('slug', flat=True)[:3])
+        if not slugs:
+            self.stdout.write(self.style.ERROR('Нет тегов для замера'))
+            return
+        limit = options['limit']
+        self.stdout.write(f'Рецептов: {Recipe.objects.count()}')
+        for size in range(1, len(slugs) + 1):
+            selected = list(next(combinations(slugs, size)))
+
+            def join_plan():
+                queryset = Recipe.objects.filter(
+                    tags__slug__in=selected
+                ).distinct()
+                queryset.count()
+                list(queryset[:limit])
+
+            def exists_plan():
+                queryset = RecipeFilter(
+                    {'tags': selected}, queryset=Recipe.objects.all()
+                ).qs
+                queryset.count()
+                list(queryset[:limit])
+
+            join_time = timed(options['repeat'], join_plan)
+            exists_time = timed(options['repeat'], exists_plan)
+            self.stdout.write(
+                f'tags={",".join(selected):<30} '
+                f'join+distinct {join_time * 1000:9.1f} ms   '
+                f'exists {exists_time * 1000:9.1f} ms'
+            )
+
+    def seed(self, count, tags_per_recipe):
+        """ Синтетические рецепты с тегами пачками bulk_create """
+
+        tags = list(Tag.objects.all())
+        for number in range(len(tags), tags_per_recipe):
+            tags.append(Tag.objects.create(
+                name=f'bench-{number}', slug=f'bench-{number}',
+                color=f'#{number:06x}'
+            ))
+        author, _ = User.objects.get_or_create(
+            username='bench_author',
+            defaults={'email': 'bench_author@example.org'}
+        )
+        through = Recipe.tags.through
+        for start in range(0, count, BATCH_SIZE):
+            size = min(BATCH_SIZE, count - start)
+            with transaction.atomic():
+                recipes = Recipe.objects.bulk_create(
+                    Recipe(
+                        author=author, name=f'bench {start + number}',
+                        text='bench', cooking_time=10,
+                        image='recipes/image/bench.png'
+                    )
+                    for number in range(size)
+                )
+                if recipes[0].pk is None:
+                    recipes = list(
+                        Recipe.objects.filter(author=author)
+                        .order_by('-id')[:size]
+                    )
+                through.objects.bulk_create(
+                    through(
+                        recipe_id=recipe.pk,
+                        tag_id=tags[(recipe.pk + shift) % len(tags)].pk
+                    )
+                    for recipe in recipes
+                    for shift in range(tags_per_recipe)
+                )
+            self.stdout.write(f'Добавлено {start + size} из {count}')
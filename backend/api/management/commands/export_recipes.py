@@ -0,0 +1,85 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+
+BATCH_SIZE = 500
+
+
+def recipe_record(recipe):
+    """ Рецепт одной строкой NDJSON: связи по естественным ключам,
+    чтобы файл можно было загрузить в другую базу """
+
+    author = recipe.author
+    return {
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'pub_date': recipe.pub_date.isoformat(),
+        'image': recipe.image.name,
+        'author': {
+            'email': author.email,
+            'username': author.username,
+            'first_name': author.first_name,
+            'last_name': author.last_name,
+        },
+        'tags': [
+            {'name': tag.name, 'color': tag.color, 'slug': tag.slug}
+            for tag in recipe.tags.all()
+        ],
+        'ingredients': [
+            {
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.ingredientforrecipe.all()
+        ],
+    }
+
+
+def recipe_batches(batch_size):
+    """ Рецепты пачками по pk: prefetch_related не работает
+    с iterator(), а OFFSET замедляется к концу таблицы """
+
+    last_pk = 0
+    while True:
+        batch = list(
+            Recipe.objects.with_related().filter(pk__gt=last_pk)
+            .order_by('pk')[:batch_size]
+        )
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1].pk
+
+
+class Command(BaseCommand):
+    help = ' Выгрузить рецепты в NDJSON '
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Файл, по умолчанию stdout')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        output = (
+            open(options['output'], 'w', encoding='utf-8')
+            if options['output'] else sys.stdout
+        )
+        exported = 0
+        try:
+            for batch in recipe_batches(options['batch_size']):
+                output.writelines(
+                    json.dumps(recipe_record(recipe), ensure_ascii=False)
+                    + '\n'
+                    for recipe in batch
+                )
+                exported += len(batch)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено рецептов: {exported}'
+        ))
@@ -0,0 +1,271 @@
+import csv
+import json
+import os
+from io import StringIO
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils.dateparse import parse_datetime
+
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from recipes.search import update_search_vectors
+from recipes.signals import bulk_changed
+from recipes.utils import bulk_create_with_ids
+from users.models import User
+
+BATCH_SIZE = 500
+
+
+def copy_rows(model, rows):
+    """ Загрузка строк через COPY FROM STDIN (только PostgreSQL) """
+
+    fields = list(rows[0])
+    buffer = StringIO()
+    csv.writer(buffer).writerows([row[field] for field in fields]
+                                 for row in rows)
+    buffer.seek(0)
+    quote = connection.ops.quote_name
+    columns = ', '.join(
+        quote(model._meta.get_field(field).column) for field in fields
+    )
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {quote(model._meta.db_table)} ({columns}) '
+            'FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+
+
+def read_checkpoint(path):
+    try:
+        with open(path, encoding='utf-8') as file:
+            return int(file.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def write_checkpoint(path, lines_done):
+    """ Число обработанных строк; запись через замену файла,
+    чтобы прерванная запись не испортила контрольную точку """
+
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        file.write(str(lines_done))
+    os.replace(temporary, path)
+
+
+class Command(BaseCommand):
+    help = ' Загрузить рецепты из NDJSON, созданного export_recipes '
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки, по умолчанию <path>.checkpoint'
+        )
+        parser.add_argument('--restart', action='store_true',
+                            help='Начать сначала, игнорируя контрольную точку')
+        parser.add_argument('--no-copy', action='store_true',
+                            help='Не использовать COPY на PostgreSQL')
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint'] or f'{options["path"]}.checkpoint'
+        lines_done = 0 if options['restart'] else read_checkpoint(checkpoint)
+        if lines_done:
+            self.stdout.write(f'Продолжаем со строки {lines_done + 1}')
+        self.use_copy = (
+            connection.vendor == 'postgresql' and not options['no_copy']
+        )
+        self.ingredients = {
+            (name, unit): pk for pk, name, unit in
+            Ingredient.objects.values_list('pk', 'name', 'measurement_unit')
+        }
+        self.tags = dict(Tag.objects.values_list('slug', 'pk'))
+        self.created = self.skipped = 0
+
+        with open(options['path'], encoding='utf-8') as file:
+            lines = islice(file, lines_done, None)
+            while True:
+                batch = list(islice(lines, options['batch_size']))
+                if not batch:
+                    break
+                records = self.parse(batch, lines_done)
+                try:
+                    with transaction.atomic():
+                        self.import_batch(records)
+                except KeyError as error:
+                    raise CommandError(
+                        f'Строки {lines_done + 1}-{lines_done + len(batch)}: '
+                        f'нет поля {error}'
+                    )
+                lines_done += len(batch)
+                write_checkpoint(checkpoint, lines_done)
+                self.stdout.write(
+                    f'Строк: {lines_done}, создано рецептов: {self.created}'
+                )
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        call_command('reconcile_counters', stdout=self.stdout)
+        for model in (Recipe, Tag, Ingredient, User):
+            bulk_changed.send(sender=model)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано рецептов: {self.created}, '
+            f'пропущено существующих или без автора: {self.skipped}'
+        ))
+
+    @staticmethod
+    def parse(batch, lines_done):
+        records = []
+        for number, line in enumerate(batch, lines_done + 1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError as error:
+                raise CommandError(f'Строка {number}: {error}')
+        return records
+
+    def import_batch(self, records):
+        authors = self.resolve_authors(records)
+        self.resolve_tags(records)
+        self.resolve_ingredients(records)
+        existing = set(Recipe.objects.filter(
+            author_id__in=authors.values(),
+            name__in={record['name'] for record in records}
+        ).values_list('author_id', 'name'))
+
+        new_records, recipes = [], []
+        for record in records:
+            author_id = authors.get(record['author']['email'])
+            if author_id is None or (author_id, record['name']) in existing:
+                self.skipped += 1
+                continue
+            existing.add((author_id, record['name']))
+            new_records.append(record)
+            recipes.append(Recipe(
+                author_id=author_id,
+                name=record['name'],
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=record['image'],
+            ))
+        if not recipes:
+            return
+        recipes = bulk_create_with_ids(Recipe, recipes, BATCH_SIZE)
+        self.restore_pub_dates(recipes, new_records)
+
+        amounts, tags = {}, set()
+        for recipe, record in zip(recipes, new_records):
+            for item in record['ingredients']:
+                ingredient_id = self.ingredients[
+                    (item['name'], item['measurement_unit'])
+                ]
+                amounts[(recipe.pk, ingredient_id)] = item['amount']
+            tags.update(
+                (recipe.pk, self.tags[tag['slug']]) for tag in record['tags']
+            )
+        self.insert(IngredientRecipe, [
+            {'recipe_id': recipe_id, 'ingredient_id': ingredient_id,
+             'amount': amount}
+            for (recipe_id, ingredient_id), amount in amounts.items()
+        ])
+        self.insert(Recipe.tags.through, [
+            {'recipe_id': recipe_id, 'tag_id': tag_id}
+            for recipe_id, tag_id in sorted(tags)
+        ])
+        update_search_vectors([recipe.pk for recipe in recipes])
+        self.created += len(recipes)
+
+    def insert(self, model, rows):
+        """ Связанные строки новых рецептов: COPY на PostgreSQL,
+        иначе bulk_create пачками """
+
+        if not rows:
+            return
+        if self.use_copy:
+            copy_rows(model, rows)
+            return
+        model.objects.bulk_create(
+            (model(**row) for row in rows),
+            batch_size=BATCH_SIZE, ignore_conflicts=True
+        )
+
+    def resolve_authors(self, records):
+        """ email -> id; недостающие авторы создаются без пароля """
+
+        profiles = {record['author']['email']: record['author']
+                    for record in records}
+        authors = dict(User.objects.filter(
+            email__in=profiles
+        ).values_list('email', 'pk'))
+        missing = [email for email in profiles if email not in authors]
+        if missing:
+            User.objects.bulk_create(
+                (User(**profiles[email], password=make_password(None))
+                 for email in missing),
+                ignore_conflicts=True
+            )
+            # Авторы с занятым username не создаются и будут пропущены
+            authors.update(User.objects.filter(
+                email__in=missing
+            ).values_list('email', 'pk'))
+        return authors
+
+    def resolve_tags(self, records):
+        missing = {
+            tag['slug']: tag for record in records for tag in record['tags']
+            if tag['slug'] not in self.tags
+        }
+        if missing:
+            Tag.objects.bulk_create(
+                (Tag(**tag) for tag in missing.values()),
+                ignore_conflicts=True
+            )
+            self.tags.update(Tag.objects.filter(
+                slug__in=missing
+            ).values_list('slug', 'pk'))
+            unknown = missing.keys() - self.tags.keys()
+            if unknown:
+                raise CommandError(
+                    f'Теги конфликтуют с существующими: {sorted(unknown)}'
+                )
+
+    def resolve_ingredients(self, records):
+        missing = {
+            (item['name'], item['measurement_unit'])
+            for record in records for item in record['ingredients']
+        } - self.ingredients.keys()
+        if missing:
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in missing),
+                ignore_conflicts=True
+            )
+            self.ingredients.update(
+                ((name, unit), pk) for pk, name, unit in
+                Ingredient.objects.filter(
+                    name__in={name for name, _ in missing}
+                ).values_list('pk', 'name', 'measurement_unit')
+            )
+
+    @staticmethod
+    def restore_pub_dates(recipes, records):
+        """ auto_now_add перезаписывает дату при bulk_create,
+        возвращаем исходные даты одним UPDATE на пачку """
+
+        Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes]).update(
+            pub_date=Case(
+                *(
+                    When(pk=recipe.pk,
+                         then=Value(parse_datetime(record['pub_date'])))
+                    for recipe, record in zip(recipes, records)
+                ),
+                output_field=DateTimeField()
+            )
+        )
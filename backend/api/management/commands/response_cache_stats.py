@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import cache_stats, cached_viewset_names
+
+
+class Command(BaseCommand):
+    help = ' Показать попадания и промахи кэша ответов API и долю 304 '
+
+    def handle(self, *args, **options):
+        for name, stats in cache_stats(cached_viewset_names()).items():
+            total = stats['hit'] + stats['miss']
+            ratio = stats['hit'] / total if total else 0
+            self.stdout.write(
+                f'{name:<12} hit {stats["hit"]:>8} miss {stats["miss"]:>8} '
+                f'hit ratio {ratio:.1%}'
+            )
+            conditional = stats['not_modified'] + stats['modified']
+            if conditional:
+                self.stdout.write(
+                    f'{"":<12} 304 {stats["not_modified"]:>8} '
+                    f'200 {stats["modified"]:>8} '
+                    f'not modified {stats["not_modified"] / conditional:.1%}'
+                )
@@ -0,0 +1,191 @@
+import json
+import platform
+import subprocess
+from statistics import quantiles
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from api.instrumentation import QueryRecorder
+from recipes.models import Recipe, Tag
+from users.models import User
+
+BENCH_CACHE_ALIAS = 'bench-dummy'
+
+
+def percentile(values, percent):
+    if len(values) == 1:
+        return values[0]
+    return quantiles(values, n=100, method='inclusive')[percent - 1]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ' Замерить задержку и число запросов основных эндпоинтов API '
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--user', help='email пользователя для замеров')
+        parser.add_argument('--only', nargs='*', default=None,
+                            help='Имена эндпоинтов для замера')
+        parser.add_argument('--response-cache', action='store_true',
+                            help='Не отключать кэш анонимных ответов')
+        parser.add_argument('--output', help='Сохранить результат в JSON')
+        parser.add_argument('--compare',
+                            help='Сравнить с сохранённым JSON')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Допустимый рост p95 при сравнении')
+
+    def handle(self, *args, **options):
+        endpoints = self.endpoints(options['user'])
+        if options['only']:
+            endpoints = [
+                endpoint for endpoint in endpoints
+                if endpoint[0] in options['only']
+            ]
+        overrides = {}
+        if not options['response_cache']:
+            overrides = {
+                'CACHES': {
+                    **settings.CACHES,
+                    BENCH_CACHE_ALIAS: {
+                        'BACKEND':
+                            'django.core.cache.backends.dummy.DummyCache'
+                    },
+                },
+                'RESPONSE_CACHE_ALIAS': BENCH_CACHE_ALIAS,
+            }
+        with override_settings(**overrides):
+            results = {
+                name: self.measure(client, url, options)
+                for name, url, client in endpoints
+            }
+        self.report(results)
+        report = {
+            'revision': git_revision(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'iterations': options['iterations'],
+            'endpoints': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            self.compare(results, options['compare'], options['threshold'])
+
+    def endpoints(self, email):
+        users = User.objects.annotate(follows=Count('follower'))
+        user = (
+            users.get(email=email) if email
+            else users.order_by('-follows', 'id').first()
+        )
+        recipe = Recipe.objects.order_by('-favorites_count', 'id').first()
+        if user is None or recipe is None:
+            raise CommandError('Нет данных, выполните seed_bench')
+        token, _ = Token.objects.get_or_create(user=user)
+        anonymous = Client()
+        authorized = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+        tags = '&'.join(
+            f'tags={slug}'
+            for slug in Tag.objects.values_list('slug', flat=True)[:2]
+        )
+        return [
+            ('recipes_anonymous', '/api/recipes/', anonymous),
+            ('recipes', '/api/recipes/', authorized),
+            ('recipes_limit_100', '/api/recipes/?limit=100', authorized),
+            ('recipes_deep_page', '/api/recipes/?page=50', authorized),
+            ('recipe_detail', f'/api/recipes/{recipe.pk}/', authorized),
+            ('recipes_by_tags', f'/api/recipes/?{tags}', authorized),
+            ('recipes_search', '/api/recipes/?search=сыр', authorized),
+            ('recipes_by_author',
+             f'/api/recipes/?author={recipe.author_id}', authorized),
+            ('recipes_favorited', '/api/recipes/?is_favorited=1', authorized),
+            ('recipes_in_cart',
+             '/api/recipes/?is_in_shopping_cart=1', authorized),
+            ('subscriptions',
+             '/api/users/subscriptions/?recipes_limit=3', authorized),
+            ('download_shopping_cart',
+             '/api/recipes/download_shopping_cart/', authorized),
+            ('ingredient_search', '/api/ingredients/?name=мак', anonymous),
+        ]
+
+    def measure(self, client, url, options):
+        for _ in range(options['warmup']):
+            self.request(client, url)
+        latencies, queries, rows, rows_known = [], [], [], True
+        for _ in range(options['iterations']):
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                started = perf_counter()
+                status = self.request(client, url)
+                latencies.append((perf_counter() - started) * 1000)
+            if status != 200:
+                raise CommandError(f'{url}: статус {status}')
+            queries.append(recorder.queries)
+            rows.append(recorder.rows)
+            rows_known = rows_known and recorder.rows_known
+        return {
+            'url': url,
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'queries': max(queries),
+            'rows': max(rows) if rows_known else None,
+        }
+
+    @staticmethod
+    def request(client, url):
+        response = client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response.status_code
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"endpoint":<24}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}'
+            f'{"queries":>9}{"rows":>9}'
+        )
+        for name, result in results.items():
+            rows = '-' if result['rows'] is None else result['rows']
+            self.stdout.write(
+                f'{name:<24}{result["p50_ms"]:>10.2f}'
+                f'{result["p95_ms"]:>10.2f}{result["p99_ms"]:>10.2f}'
+                f'{result["queries"]:>9}{rows:>9}'
+            )
+
+    def compare(self, results, path, threshold):
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)['endpoints']
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            change = result['p95_ms'] / before['p95_ms'] - 1
+            self.stdout.write(
+                f'{name:<24} p95 {before["p95_ms"]:.2f} -> '
+                f'{result["p95_ms"]:.2f} ms ({change:+.0%}), queries '
+                f'{before["queries"]} -> {result["queries"]}'
+            )
+            if (change > threshold
+                    or result['queries'] > before['queries']):
+                regressions.append(name)
+        if regressions:
+            raise CommandError(f'Регрессия: {", ".join(regressions)}')
@@ -0,0 +1,133 @@
+from random import Random
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag)
+from recipes.signals import bulk_changed
+from recipes.utils import bulk_create_with_ids
+from users.models import Follow, User
+
+BATCH_SIZE = 2000
+BENCH_PASSWORD = 'bench-password'
+
+
+class Command(BaseCommand):
+    help = ' Наполнить базу данными для нагрузочного тестирования '
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Подписок на пользователя')
+        parser.add_argument('--favorites', type=int, default=30,
+                            help='Избранных рецептов на пользователя')
+        parser.add_argument('--cart', type=int, default=10,
+                            help='Рецептов в списке покупок пользователя')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random = Random(options['seed'])
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        if not ingredient_ids or not tag_ids:
+            raise CommandError('Сначала выполните load_data')
+
+        with transaction.atomic():
+            users = self.create_users(options['users'])
+            recipes = self.create_recipes(
+                random, users, options['recipes'], ingredient_ids, tag_ids
+            )
+            self.create_links(random, users, recipes, options)
+
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('rebuild_cart_totals', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(users)}, рецептов: {len(recipes)}. '
+            f'Пароль пользователей: {BENCH_PASSWORD}'
+        ))
+
+    def create_users(self, count):
+        start = User.objects.count()
+        password = make_password(BENCH_PASSWORD)
+        return bulk_create_with_ids(User, [
+            User(
+                username=f'bench{start + number}',
+                email=f'bench{start + number}@example.org',
+                first_name='Bench', last_name=f'User{start + number}',
+                password=password
+            )
+            for number in range(count)
+        ], BATCH_SIZE)
+
+    def create_recipes(self, random, users, count, ingredient_ids, tag_ids):
+        recipes = bulk_create_with_ids(Recipe, [
+            Recipe(
+                author=random.choice(users),
+                name=f'Рецепт {number}',
+                text='Описание рецепта для нагрузочного теста. ' * 5,
+                cooking_time=random.randint(5, 180),
+                image='recipes/image/bench.png'
+            )
+            for number in range(count)
+        ], BATCH_SIZE)
+        IngredientRecipe.objects.bulk_create(
+            (
+                IngredientRecipe(
+                    recipe_id=recipe.pk, ingredient_id=ingredient_id,
+                    amount=random.randint(1, 500)
+                )
+                for recipe in recipes
+                for ingredient_id in random.sample(
+                    ingredient_ids,
+                    min(random.randint(5, 20), len(ingredient_ids))
+                )
+            ),
+            batch_size=BATCH_SIZE
+        )
+        through = Recipe.tags.through
+        through.objects.bulk_create(
+            (
+                through(recipe_id=recipe.pk, tag_id=tag_id)
+                for recipe in recipes
+                for tag_id in random.sample(
+                    tag_ids, random.randint(1, len(tag_ids))
+                )
+            ),
+            batch_size=BATCH_SIZE
+        )
+        return recipes
+
+    def create_links(self, random, users, recipes, options):
+        follows, favorites, carts = [], [], []
+        for user in users:
+            authors = random.sample(
+                users, min(options['follows'] + 1, len(users))
+            )
+            follows.extend(
+                Follow(user_id=user.pk, author_id=author.pk)
+                for author in authors if author.pk != user.pk
+            )
+            favorites.extend(
+                Favorite(user_id=user.pk, recipe_id=recipe.pk)
+                for recipe in random.sample(
+                    recipes, min(options['favorites'], len(recipes))
+                )
+            )
+            carts.extend(
+                ShoppingCart(user_id=user.pk, recipe_id=recipe.pk)
+                for recipe in random.sample(
+                    recipes, min(options['cart'], len(recipes))
+                )
+            )
+        for model, objects in (
+            (Follow, follows), (Favorite, favorites), (ShoppingCart, carts)
+        ):
+            model.objects.bulk_create(
+                objects, batch_size=BATCH_SIZE, ignore_conflicts=True
+            )
+            bulk_changed.send(sender=model)
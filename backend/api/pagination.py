@@ -1,5 +1,110 @@
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class RecipePagination(CustomPagination):
+    """ Постраничный вывод рецептов.
+
+    По умолчанию - номера страниц. С параметром ?cursor= включается
+    keyset-пагинация по (pub_date, id): без OFFSET и без COUNT(*).
+    Пустой cursor означает первую страницу.
+    """
+
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        if request.query_params.get('ordering'):
+            raise ValidationError(
+                {'cursor': 'Курсор работает только с сортировкой по дате'}
+            )
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(
+            request.query_params[self.cursor_query_param]
+        )
+        if position is not None:
+            pub_date, pk = position
+            if reverse:
+                boundary = Q(pub_date__gt=pub_date) | Q(
+                    pub_date=pub_date, id__gt=pk
+                )
+            else:
+                boundary = Q(pub_date__lt=pub_date) | Q(
+                    pub_date=pub_date, id__lt=pk
+                )
+            queryset = queryset.filter(boundary)
+        if reverse:
+            queryset = queryset.order_by('pub_date', 'id')
+        else:
+            queryset = queryset.order_by('-pub_date', '-id')
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+        has_next = has_more if not reverse else True
+        has_previous = position is not None if not reverse else has_more
+        self.next_position = (
+            self.position_of(results[-1]) if results and has_next else None
+        )
+        self.previous_position = (
+            self.position_of(results[0])
+            if results and has_previous else None
+        )
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.cursor_link(self.next_position, False)),
+            ('previous', self.cursor_link(self.previous_position, True)),
+            ('results', data)
+        ]))
+
+    @staticmethod
+    def position_of(recipe):
+        if isinstance(recipe, dict):
+            return recipe['pub_date'], recipe['id']
+        return recipe.pub_date, recipe.id
+
+    def cursor_link(self, position, reverse):
+        if position is None:
+            return None
+        pub_date, pk = position
+        token = b64encode(
+            f'{pub_date.isoformat()}|{pk}|{int(reverse)}'.encode(),
+            altchars=b'-_'
+        ).decode()
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, token):
+        if not token:
+            return None, False
+        try:
+            pub_date, pk, reverse = b64decode(
+                token.encode(), altchars=b'-_', validate=True
+            ).decode().split('|')
+            return (
+                (datetime.fromisoformat(pub_date), int(pk)),
+                reverse == '1'
+            )
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.db.models import Value
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Follow
+from .cache import (KEY_PREFIX, bump_generation, get_generations,
+                    response_cache)
+
+RELATIONS_SCOPE = 'relations'
+
+
+class UserRelations:
+    """ id избранных рецептов, рецептов в корзине и авторов, на которых
+    подписан пользователь. Флаги сериализаторов проверяются по этим
+    множествам без запросов к базе. """
+
+    __slots__ = ('favorites', 'cart', 'following')
+
+    def __init__(self, favorites=(), cart=(), following=()):
+        self.favorites = frozenset(favorites)
+        self.cart = frozenset(cart)
+        self.following = frozenset(following)
+
+    def __getstate__(self):
+        return self.favorites, self.cart, self.following
+
+    def __setstate__(self, state):
+        self.favorites, self.cart, self.following = state
+
+
+NO_RELATIONS = UserRelations()
+
+
+def relations_scopes(user_id):
+    """ Области кэша, поколения которых - версия связей пользователя:
+    общая (массовые изменения) и его собственная """
+
+    return (RELATIONS_SCOPE, f'{RELATIONS_SCOPE}:{user_id}')
+
+
+def bump_relations_version(user_id):
+    """ Новая версия связей пользователя после фиксации транзакции.
+    По ней сбрасываются кэш связей и ETag ответов рецептов. """
+
+    bump_generation(relations_scopes(user_id)[1])
+
+
+def load_relations(user):
+    """ Все три множества одним запросом UNION ALL """
+
+    rows = Favorite.objects.filter(user=user).annotate(
+        kind=Value('favorites')
+    ).values_list('kind', 'recipe_id').order_by().union(
+        ShoppingCart.objects.filter(user=user).annotate(
+            kind=Value('cart')
+        ).values_list('kind', 'recipe_id').order_by(),
+        Follow.objects.filter(user=user).annotate(
+            kind=Value('following')
+        ).values_list('kind', 'author_id').order_by(),
+        all=True
+    )
+    ids = {'favorites': [], 'cart': [], 'following': []}
+    for kind, pk in rows:
+        ids[kind].append(pk)
+    return UserRelations(**ids)
+
+
+def cached_relations(user):
+    """ Связи из кэша ответов. Ключ содержит версию пользователя и
+    поколение relations, поэтому изменения сразу дают новый ключ. """
+
+    cache = response_cache()
+    generation, version = get_generations(relations_scopes(user.pk))
+    key = f'{KEY_PREFIX}:relations:{user.pk}:{version}:{generation}'
+    relations = cache.get(key)
+    if relations is None:
+        relations = load_relations(user)
+        cache.set(key, relations, settings.USER_RELATIONS_CACHE_TIMEOUT)
+    return relations
+
+
+def user_relations(context):
+    """ Связи текущего пользователя, один раз на запрос """
+
+    request = context.get('request')
+    if request is None or request.user.is_anonymous:
+        return NO_RELATIONS
+    relations = getattr(request, 'user_relations', None)
+    if relations is None:
+        if settings.USER_RELATIONS_CACHE_TIMEOUT:
+            relations = cached_relations(request.user)
+        else:
+            relations = load_relations(request.user)
+        request.user_relations = relations
+    return relations
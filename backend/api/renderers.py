@@ -0,0 +1,53 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+LINE_SEPARATORS = (
+    ('\u2028'.encode(), b'\\u2028'),
+    ('\u2029'.encode(), b'\\u2029'),
+)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """ JSONRenderer на orjson с тем же выводом байт в байт.
+
+    Настройки DRF по умолчанию (UNICODE_JSON, COMPACT_JSON) дают
+    компактный UTF-8 - orjson пишет так же. Даты, Decimal и ленивые
+    строки проходят через кодировщик DRF. Всё, что orjson записал бы
+    иначе - отступы, нестроковые ключи, Decimal как float, - уходит
+    в стандартный рендерер. Числа с плавающей точкой orjson форматирует
+    по-своему, поэтому рендерер подходит для ответов без float.
+    """
+
+    encoder = JSONEncoder()
+
+    def default(self, obj):
+        value = self.encoder.default(obj)
+        if isinstance(value, float):
+            raise TypeError('float форматируется стандартным рендерером')
+        return value
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if (
+            self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context)
+            is not None
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        try:
+            ret = orjson.dumps(
+                data, default=self.default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME
+            )
+        except orjson.JSONEncodeError:
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        for separator, escaped in LINE_SEPARATORS:
+            ret = ret.replace(separator, escaped)
+        return ret
@@ -1,16 +1,41 @@
 from django.conf import settings
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
-from rest_framework.serializers import (IntegerField,
-                                        ModelSerializer,
-                                        PrimaryKeyRelatedField, ReadOnlyField,
+from rest_framework.serializers import (IntegerField, ListField,
+                                        ModelSerializer, ReadOnlyField,
                                         SerializerMethodField)
-from recipes.models import (Ingredient, IngredientRecipe, Recipe, Tag)
+from recipes.images import schedule_image_processing, variant_url
+from recipes.models import (Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCartTotals, Tag)
+from recipes.search import update_search_vectors
 from users.models import User
 
+from .fields import StreamingImageField
+from .relations import user_relations
+
+
+def resolve_ids(model, ids):
+    """Объекты по списку id одним запросом id__in.
+    Возвращает {id: объект} и ошибки с отсутствующими и повторяющимися
+    id, чтобы сообщить обо всех сразу."""
+
+    seen, duplicates = set(), {}
+    for pk in ids:
+        if pk in seen:
+            duplicates[pk] = None
+        seen.add(pk)
+    objects = model.objects.in_bulk(seen)
+    missing = [pk for pk in dict.fromkeys(ids) if pk not in objects]
+    errors = {}
+    if missing:
+        errors['missing'] = missing
+    if duplicates:
+        errors['duplicates'] = list(duplicates)
+    return objects, errors
+
 
 class CustomUserSerializer(UserSerializer):
     """ Сериализатор пользователя """
@@ -22,10 +47,9 @@ class CustomUserSerializer(UserSerializer):
                   'last_name', 'is_subscribed', )
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if not self.context.get('request').user.is_anonymous:
-            return obj.following.filter(user=request.user).exists()
-        return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return obj.pk in user_relations(self.context).following
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -38,13 +62,15 @@ class CustomUserCreateSerializer(UserCreateSerializer):
             'last_name', 'password')
 
 
-class SubscribeListSerializer(UserSerializer):
+class SubscribeListSerializer(CustomUserSerializer):
     """ Сериализатор подписок """
     recipes_count = SerializerMethodField()
     recipes = SerializerMethodField()
 
-    class Meta(UserSerializer.Meta):
-        fields = UserSerializer.Meta.fields + ('recipes_count', 'recipes')
+    class Meta(CustomUserSerializer.Meta):
+        fields = CustomUserSerializer.Meta.fields + (
+            'recipes_count', 'recipes'
+        )
         read_only_fields = ('email', 'username', 'first_name', 'last_name')
 
     def validate(self, data):
@@ -65,20 +91,16 @@ class SubscribeListSerializer(UserSerializer):
         return data
 
     def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if limit:
-            limit_numb = int(limit)
-            if isinstance(limit_numb, int):
-                recipes = recipes[: limit_numb]
-            else:
-                raise ValidationError(
-                    'Не возможно преобразовать строку в число'
-                )
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            recipes = obj.recipes.all()
+            limit = self.context.get('recipes_limit')
+            if limit is not None:
+                recipes = recipes[:limit]
         serializer = RecipeShortSerializer(recipes, many=True, read_only=True)
         return serializer.data
 
@@ -126,16 +148,37 @@ class ReadIngredientRecipeSerializer(ModelSerializer):
         read_only_fields = ('amount',)
 
 
+class RecipeImageField(serializers.Field):
+    """ URL уменьшенного варианта изображения рецепта. В контексте
+    можно передать image_variant, чтобы выбрать другой вариант. """
+
+    def __init__(self, variant, **kwargs):
+        kwargs.update(source='*', read_only=True)
+        self.variant = variant
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        url = variant_url(
+            recipe, self.context.get('image_variant', self.variant),
+            settings.IMAGE_VARIANT_FORMAT
+        )
+        request = self.context.get('request')
+        if url is not None and request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
 class ReadRecipeSerializer(ModelSerializer):
     """Сериализатор для прочтения рецепта"""
 
-    author = UserSerializer(read_only=True)
+    author = CustomUserSerializer(read_only=True)
     ingredients = ReadIngredientRecipeSerializer(
         many=True, read_only=True, source='ingredientforrecipe'
     )
     tags = TagSerializer(many=True, read_only=True)
     is_favorited = SerializerMethodField(read_only=True)
     is_in_shopping_cart = SerializerMethodField(read_only=True)
+    image = RecipeImageField('card')
 
     class Meta:
         model = Recipe
@@ -145,22 +188,16 @@ class ReadRecipeSerializer(ModelSerializer):
         )
 
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        if not request or request.user.is_anonymous:
-            return False
-        return obj.favorites.filter(user=request.user).exists()
+        return obj.pk in user_relations(self.context).favorites
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request')
-        if not request or request.user.is_anonymous:
-            return False
-        return obj.shopping_cart.filter(user=request.user).exists()
+        return obj.pk in user_relations(self.context).cart
 
 
 class IngredientRecipeCreateSerializer(ModelSerializer):
     """Сериализатор создания ингредиентов для рецепта"""
 
-    id = PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = IntegerField()
     amount = IntegerField(
         write_only=True,
         min_value=1,
@@ -179,8 +216,11 @@ class CreateRecipeSerializer(ModelSerializer):
         many=True, source='ingredient'
     )
     author = UserSerializer(read_only=True)
-    tags = PrimaryKeyRelatedField(queryset=Tag.objects.all(), many=True)
-    image = Base64ImageField(required=True)
+    tags = ListField(
+        child=IntegerField(), allow_empty=False,
+        error_messages={'empty': 'Количество тегов не может быть менее 1!'}
+    )
+    image = StreamingImageField(required=True)
     cooking_time = IntegerField(
         write_only=True,
         min_value=1,
@@ -195,38 +235,46 @@ class CreateRecipeSerializer(ModelSerializer):
         )
         read_only_fields = ('author',)
 
-    def validate_tags(self, data):
-        """Валидация тегов."""
-        tags = data
-        tags_list = []
-        for tag in tags:
-            if not Tag.objects.filter(id=tag.id).exists():
-                raise ValidationError(
-                    'Количество тегов не может быть менее 1!'
-                )
-            if tag in tags_list:
-                raise ValidationError(
-                    {'tags': 'Теги должны быть уникальны'}
-                )
-        tags_list.append(tag)
-        return data
+    def save(self, **kwargs):
+        """Временный файл изображения хранилище переносит на место,
+        поэтому закрываем его сами, как Django закрывает request.FILES."""
+
+        try:
+            return super().save(**kwargs)
+        finally:
+            image = self.validated_data.get('image')
+            if image is not None:
+                image.close()
 
     def validate_ingredients(self, ingredients):
         """Валидация ингридиентов."""
 
-        ingredients_list = []
         if not ingredients:
             raise serializers.ValidationError(
                 'Отсутствуют ингридиенты')
-        for ingredient in ingredients:
-            if ingredient['id'] in ingredients_list:
-                raise serializers.ValidationError(
-                    'Ингридиенты должны быть уникальны')
-            ingredients_list.append(ingredient['id'])
-            if int(ingredient.get('amount')) < 1:
-                raise serializers.ValidationError(
-                    'Количество ингредиента больше 0')
-            return ingredients
+        return ingredients
+
+    def validate(self, data):
+        """Теги и ингредиенты загружаются одним запросом каждые;
+        все отсутствующие и повторяющиеся id возвращаются одной
+        ошибкой: {"tags": {"missing": [...], "duplicates": [...]}}."""
+
+        errors = {}
+        if 'tags' in data:
+            tags, errors['tags'] = resolve_ids(Tag, data['tags'])
+            if not errors['tags']:
+                data['tags'] = [tags[pk] for pk in data['tags']]
+        if 'ingredient' in data:
+            ingredients, errors['ingredients'] = resolve_ids(
+                Ingredient, [item['id'] for item in data['ingredient']]
+            )
+            if not errors['ingredients']:
+                for item in data['ingredient']:
+                    item['id'] = ingredients[item['id']]
+        errors = {field: error for field, error in errors.items() if error}
+        if errors:
+            raise ValidationError(errors)
+        return data
 
     def ingredient_recipe_bulk_create(self, ingredients, recipe):
         """Создание ингредиентов рецепта."""
@@ -253,24 +301,103 @@ class CreateRecipeSerializer(ModelSerializer):
         recipe.save()
         self.ingredient_recipe_bulk_create(ingredients, recipe)
         recipe.tags.set(tags)
+        update_search_vectors([recipe.pk])
+        schedule_image_processing(recipe)
         return recipe
 
+    def update_ingredients(self, instance, ingredients):
+        """Сверяет состав рецепта с присланным: добавляет новые
+        ингредиенты, меняет количество и удаляет убранные.
+        Возвращает старый и новый состав {ingredient_id: amount}."""
+
+        current = {
+            row.ingredient_id: row
+            for row in IngredientRecipe.objects.filter(recipe=instance)
+        }
+        old_amounts = {
+            ingredient_id: row.amount for ingredient_id, row in current.items()
+        }
+        new_amounts = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        removed = old_amounts.keys() - new_amounts.keys()
+        if removed:
+            IngredientRecipe.objects.filter(
+                recipe=instance, ingredient_id__in=removed
+            ).delete()
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                recipe=instance, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id not in current
+        )
+        changed = []
+        for ingredient_id, row in current.items():
+            amount = new_amounts.get(ingredient_id, row.amount)
+            if amount != row.amount:
+                row.amount = amount
+                changed.append(row)
+        IngredientRecipe.objects.bulk_update(changed, ('amount',))
+        return old_amounts, new_amounts
+
+    def update_tags(self, instance, tags):
+        """Добавляет и убирает только изменившиеся теги."""
+
+        current = set(instance.tags.values_list('id', flat=True))
+        new = {tag.id for tag in tags}
+        if current - new:
+            instance.tags.remove(*(current - new))
+        if new - current:
+            instance.tags.add(*(new - current))
+        return current != new
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        """Обновление рецепта."""
-
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredient')
-        instance = super().update(instance, validated_data)
-        instance.tags.clear()
-        instance.ingredients.clear()
-        instance.name = validated_data.get('name')
-        instance.text = validated_data.get('text')
-        instance.cooking_time = validated_data.get('cooking_time')
-        if validated_data.get('image') is not None:
-            instance.image = validated_data.pop('image')
-        instance.save()
-        self.ingredient_recipe_bulk_create(ingredients, instance)
-        instance.tags.set(tags)
+        """Обновление рецепта: строка рецепта блокируется до конца
+        транзакции, записываются только изменившиеся поля и связи."""
+
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredient', None)
+        instance = Recipe.objects.select_for_update().get(pk=instance.pk)
+
+        changed_fields = [
+            field for field, value in validated_data.items()
+            if field == 'image' or getattr(instance, field) != value
+        ]
+        for field in changed_fields:
+            setattr(instance, field, validated_data[field])
+        if 'image' in changed_fields:
+            instance.image_variants = {}
+            changed_fields.append('image_variants')
+
+        relations_changed = False
+        if tags is not None:
+            relations_changed = self.update_tags(instance, tags)
+        search_changed = bool({'name', 'text'} & set(changed_fields))
+        if ingredients is not None:
+            old_amounts, new_amounts = self.update_ingredients(
+                instance, ingredients
+            )
+            if old_amounts != new_amounts:
+                relations_changed = True
+                ShoppingCartTotals.objects.change_recipe(
+                    instance, old_amounts, new_amounts
+                )
+            search_changed |= old_amounts.keys() != new_amounts.keys()
+        if changed_fields or relations_changed:
+            # Сохранение поднимает версию рецепта, а post_save
+            # сбрасывает кэш ответов и при изменении только связей
+            instance.save(update_fields=changed_fields)
+        if 'image' in changed_fields:
+            schedule_image_processing(instance)
+        if search_changed:
+            # После фиксации: вектор не удлиняет блокировку рецепта,
+            # а запасной индекс не перестроится по старым данным
+            transaction.on_commit(
+                lambda: update_search_vectors([instance.pk])
+            )
         return instance
 
     def to_representation(self, instance):
@@ -281,6 +408,8 @@ class RecipeShortSerializer(ModelSerializer):
     """ Сериализатор полей краткого отображения рецептов
     для избранного и листа покупок """
 
+    image = RecipeImageField('thumb')
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
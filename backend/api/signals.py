@@ -0,0 +1,73 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag)
+from recipes.signals import bulk_changed
+from users.models import Follow, User
+from .cache import bump_generation
+from .filters import TAG_SLUGS_CACHE_KEY
+from .relations import RELATIONS_SCOPE, bump_relations_version
+
+# Модель: области кэша ответов, которые устаревают при её изменении.
+# recipe_counters - версия списков рецептов для ETag: избранное и
+# корзина меняют сортировку по счётчикам
+CACHE_SCOPES = {
+    Recipe: ('recipes',),
+    IngredientRecipe: ('recipes',),
+    User: ('users',),
+    Tag: ('tags',),
+    Ingredient: ('ingredients',),
+    Favorite: ('recipe_counters',),
+    ShoppingCart: ('recipe_counters',),
+}
+
+# Поля модели, которые попадают в кэшированные ответы. save() с
+# update_fields без них (last_login при входе) кэш не сбрасывает
+CACHED_FIELDS = {
+    User: frozenset(('email', 'username', 'first_name', 'last_name')),
+}
+
+
+def invalidate_response_cache(sender, update_fields=None, **kwargs):
+    if (
+        update_fields is not None and sender in CACHED_FIELDS
+        and CACHED_FIELDS[sender].isdisjoint(update_fields)
+    ):
+        return
+    for scope in CACHE_SCOPES[sender]:
+        bump_generation(scope)
+
+
+for cached_model in CACHE_SCOPES:
+    post_save.connect(invalidate_response_cache, sender=cached_model)
+    post_delete.connect(invalidate_response_cache, sender=cached_model)
+    bulk_changed.connect(invalidate_response_cache, sender=cached_model)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_relations_changed(action, **kwargs):
+    if action.startswith('post_'):
+        bump_generation('recipes')
+
+
+@receiver((post_save, post_delete, bulk_changed), sender=Tag)
+def tag_changed(**kwargs):
+    transaction.on_commit(lambda: cache.delete(TAG_SLUGS_CACHE_KEY))
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Follow)
+def user_relations_changed(instance, **kwargs):
+    bump_relations_version(instance.user_id)
+
+
+@receiver(bulk_changed, sender=Favorite)
+@receiver(bulk_changed, sender=ShoppingCart)
+@receiver(bulk_changed, sender=Follow)
+def user_relations_bulk_changed(**kwargs):
+    bump_generation(RELATIONS_SCOPE)
@@ -0,0 +1,171 @@
+import os
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Follow, User
+from .management.commands.bench_image_upload import (make_image,
+                                                     peak_rss_growth)
+
+
+class RecipeFixtureMixin:
+    """ Автор, теги, ингредиенты и клиент с токеном """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.org', username='author',
+            first_name='Автор', last_name='Рецептов', password='x'
+        )
+        cls.user = User.objects.create_user(
+            email='reader@example.org', username='reader',
+            first_name='Читатель', last_name='Рецептов', password='x'
+        )
+        cls.tags = [
+            Tag.objects.create(
+                name=f'Тег {number}', color=f'#00000{number}',
+                slug=f'tag-{number}'
+            )
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number:02d}', measurement_unit='г'
+            )
+            for number in range(10)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    @classmethod
+    def create_recipe(cls, number):
+        recipe = Recipe.objects.create(
+            author=cls.author, name=f'Рецепт {number}', text='Описание',
+            cooking_time=10, image='recipes/image/test.png'
+        )
+        recipe.tags.set(cls.tags[:number % 3 + 1])
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                recipe=recipe,
+                ingredient=cls.ingredients[(number + shift) % 10],
+                amount=shift + 1
+            )
+            for shift in range(3)
+        )
+        return recipe
+
+
+class RecipeListQueriesTest(RecipeFixtureMixin, TestCase):
+    """ Число запросов страницы рецептов не зависит от её размера """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        recipes = [cls.create_recipe(number) for number in range(100)]
+        Favorite.objects.create(user=cls.user, recipe=recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=recipes[1])
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def count_queries(self, limit):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/recipes/', {'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), limit)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_limit(self):
+        for flat in (True, False):
+            with self.subTest(flat=flat), override_settings(
+                FLAT_RECIPE_LIST=flat
+            ):
+                self.assertEqual(
+                    self.count_queries(6), self.count_queries(100)
+                )
+
+
+@skipUnless(
+    os.path.exists('/proc/self/clear_refs'), 'Пик RSS измеряется на Linux'
+)
+class ImageUploadMemoryTest(SimpleTestCase):
+    """ Пик RSS при загрузке base64: потоковое декодирование не держит
+    в памяти декодированный файл, в отличие от декодирования целиком """
+
+    def test_streaming_decode_peak_rss(self):
+        image = make_image(4, seed=0)
+        growth = peak_rss_growth(image)
+        self.assertGreater(growth['целиком'], len(image))
+        self.assertLess(growth['потоково'], len(image) // 4)
+
+
+class RecipeUpdateStatementsTest(RecipeFixtureMixin, TestCase):
+    """ Правка только названия не трогает теги и ингредиенты """
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.author)
+        self.recipe = self.create_recipe(1)
+
+    def update_statements(self, data):
+        """ Запросы внутри транзакции update() сериализатора """
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.pk}/', data, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        statements = [query['sql'] for query in queries.captured_queries]
+        start = next(
+            number for number, sql in enumerate(statements)
+            if sql.startswith('SAVEPOINT')
+        )
+        end = next(
+            number for number, sql in enumerate(statements)
+            if sql.startswith('RELEASE SAVEPOINT')
+        )
+        return statements[start + 1:end]
+
+    def test_title_only_edit(self):
+        statements = self.update_statements({
+            'name': 'Новое название',
+            'text': self.recipe.text,
+            'cooking_time': self.recipe.cooking_time,
+            'tags': [tag.pk for tag in self.recipe.tags.all()],
+            'ingredients': [
+                {'id': row.ingredient_id, 'amount': row.amount}
+                for row in self.recipe.ingredientforrecipe.all()
+            ],
+        })
+        # Блокировка рецепта, текущие теги и ингредиенты, UPDATE;
+        # поисковый вектор пересчитывается уже после фиксации
+        self.assertEqual(len(statements), 4)
+        writes = [
+            sql for sql in statements
+            if sql.startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('UPDATE "recipes_recipe"'))
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, 'Новое название')
+
+    def test_partial_title_edit(self):
+        statements = self.update_statements({'name': 'Новое название'})
+        self.assertEqual(len(statements), 2)
+
+
+class RecipeRetrieveTest(RecipeFixtureMixin, TestCase):
+    """ Проверка версии для ETag не ломает ответ 404 """
+
+    def test_invalid_pk_is_not_found(self):
+        for pk in ('abc', '999'):
+            with self.subTest(pk=pk):
+                response = self.client.get(f'/api/recipes/{pk}/')
+                self.assertEqual(response.status_code, 404)
@@ -2,7 +2,9 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from users.views import CustomUserViewSet
-from .views import IngredientsViewSet, RecipeViewSet, TagViewSet
+from .async_views import with_concurrent_reads
+from .views import (IngredientsViewSet, PerformanceView, RecipeViewSet,
+                    TagViewSet)
 
 app_name = 'api'
 
@@ -14,7 +16,10 @@ router_v1.register('users', CustomUserViewSet, basename='subscribes')
 
 
 urlpatterns = [
-    path('', include(router_v1.urls)),
+    path('_perf/', PerformanceView.as_view(), name='performance'),
+    path('', include(with_concurrent_reads(
+        router_v1.urls, (IngredientsViewSet, RecipeViewSet, TagViewSet)
+    ))),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
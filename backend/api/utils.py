@@ -1,28 +1,69 @@
-from django.db.models import F, Sum
-from django.http.response import HttpResponse
+from hashlib import md5
 
-from recipes.models import Recipe, IngredientRecipe
+from django.core.handlers.asgi import ASGIRequest
+from django.http.response import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from rest_framework.exceptions import ValidationError
+from rest_framework.negotiation import DefaultContentNegotiation
 
+from recipes.models import ShoppingCartTotals
+from .cache import get_generations
+from .exporters import EXPORTERS
 
-def download_cart(user):
+SHOPPING_LIST_CHUNK_SIZE = 500
+
+
+class FileFormatContentNegotiation(DefaultContentNegotiation):
+    """ Параметр ?format= выбирает формат файла, а не рендерер DRF:
+    ошибки всегда отдаются первым рендерером (JSON). """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def shopping_cart_ingredients(user):
+    """ Суммарное количество ингредиентов из списка покупок """
+
+    return ShoppingCartTotals.objects.for_download(user)
+
+
+def shopping_cart_etag(user, file_format):
+    """ Отпечаток списка покупок без запросов: версия списка из
+    пользователя и поколение ингредиентов (переименования) """
+
+    digest = md5(
+        f'{user.id}:{file_format}:{user.shopping_cart_revision}:'
+        f'{get_generations(("ingredients",))}'.encode()
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def download_cart(request):
     """ Функция вывода списка ингридиентов для покупки на печать."""
 
-    recipes = Recipe.objects.filter(shopping_cart__user=user)
-    shopping_cart = IngredientRecipe.objects.filter(
-        recipe__in=recipes).values(
-        name=F('ingredient__name'),
-        units=F('ingredient__measurement_unit')).order_by(
-        'ingredient__name').annotate(total=Sum('amount'))
-    ingr_list = []
-    for recipe in shopping_cart:
-        ingr_list.append(recipe)
-    shopping_list = 'Купить в магазине:\n'
-    for ingredient in shopping_cart:
-        shopping_list += (
-            f'{ingredient["name"]}: '
-            f'{ingredient["total"]}'
-            f'{ingredient["units"]}.\n')
-    file = 'shopping_list.txt'
-    response = HttpResponse(shopping_list, content_type='text/plain')
-    response['Content-Disposition'] = f'attachment; filename="{file}.txt"'
+    file_format = request.query_params.get('format', 'txt')
+    if file_format not in EXPORTERS:
+        raise ValidationError(
+            {'format': f'Доступные форматы: {", ".join(EXPORTERS)}'}
+        )
+    user = request.user
+    etag = shopping_cart_etag(user, file_format)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+    content_type, render = EXPORTERS[file_format]
+    rows = shopping_cart_ingredients(user).iterator(
+        chunk_size=SHOPPING_LIST_CHUNK_SIZE
+    )
+    # Под ASGI Django 3.2 читает StreamingHttpResponse в цикле событий,
+    # где ORM недоступен, поэтому файл собирается здесь же, в потоке
+    response_class = (
+        HttpResponse if isinstance(request._request, ASGIRequest)
+        else StreamingHttpResponse
+    )
+    response = response_class(render(rows), content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_list.{file_format}"'
+    )
+    response['ETag'] = etag
     return response
@@ -1,60 +1,91 @@
+from django.conf import settings
+from django.db import connection, transaction
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.decorators import action
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 from rest_framework.status import (HTTP_201_CREATED, HTTP_204_NO_CONTENT,
                                    HTTP_400_BAD_REQUEST)
-from rest_framework.permissions import (IsAuthenticated,
+from rest_framework.permissions import (SAFE_METHODS, IsAdminUser,
+                                        IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 
+from recipes.ingredient_index import get_ingredient_index
 from recipes.models import (Favorite, Ingredient,
-                            Recipe, ShoppingCart,
-                            Tag)
-from .filters import (RecipeFilter, IngredientNameFilter)
-from .pagination import CustomPagination
+                            Recipe, ShoppingCart, Tag)
+from .cache import CachedReadMixin, cache_stats, cached_viewset_names
+from .conditional import ConditionalReadMixin
+from .flat_list import FlatListMixin
+from .instrumentation import InstrumentedViewMixin, endpoint_stats
+from .filters import (RecipeFilter, IngredientNameFilter,
+                      RecipeOrderingFilter)
+from .pagination import RecipePagination
 from .permissions import AuthorOnlyPermission
+from .renderers import ORJSONRenderer
 from .serializers import (CreateRecipeSerializer, RecipeShortSerializer,
                           IngredientSerializer, ReadRecipeSerializer,
                           TagSerializer)
-from .utils import download_cart
+from .utils import FileFormatContentNegotiation, download_cart
 
 
-class TagViewSet(ModelViewSet):
+class TagViewSet(InstrumentedViewMixin, CachedReadMixin, ModelViewSet):
     """ Вьюсет тегов """
+    cache_scopes = ('tags',)
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAuthenticatedOrReadOnly, )
     pagination_class = None
 
 
-class IngredientsViewSet(ModelViewSet):
+class IngredientsViewSet(InstrumentedViewMixin, CachedReadMixin,
+                         ModelViewSet):
     """Вьюсет для ингредиентов"""
 
-    queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     filter_backends = (IngredientNameFilter, )
     pagination_class = None
+    cache_scopes = ('ingredients',)
 
     def get_queryset(self):
-
-        queryset = Ingredient.objects.all()
-        name = self.request.query_params.get('name')
-        if name is not None:
-            queryset = queryset.filter(name__istartswith=name.lower())
-        return queryset
-
-
-class RecipeViewSet(ModelViewSet):
+        """Поиск по началу названия отвечает из индекса в памяти.
+        С fuzzy=1 допускаются опечатки: на PostgreSQL через pg_trgm,
+        на остальных базах через триграммы индекса в памяти."""
+
+        if self.action == 'list':
+            name = self.request.query_params.get('name', '')
+            fuzzy = self.request.query_params.get('fuzzy') in ('1', 'true')
+            if name and fuzzy:
+                if connection.vendor == 'postgresql':
+                    return Ingredient.objects.fuzzy_search(
+                        name, settings.INGREDIENT_FUZZY_LIMIT
+                    )
+                return get_ingredient_index().fuzzy_search(
+                    name, settings.INGREDIENT_FUZZY_LIMIT
+                )
+            return get_ingredient_index().search(name)
+        return Ingredient.objects.all()
+
+
+class RecipeViewSet(InstrumentedViewMixin, ConditionalReadMixin,
+                    CachedReadMixin, FlatListMixin, ModelViewSet):
     """ Вьюсет рецептов """
 
     queryset = Recipe.objects.all()
+    renderer_classes = (ORJSONRenderer, BrowsableAPIRenderer)
     permission_classes = (IsAuthenticatedOrReadOnly, AuthorOnlyPermission)
-    pagination_class = CustomPagination
+    pagination_class = RecipePagination
     filterset_class = RecipeFilter
-    filter_backends = (DjangoFilterBackend, )
+    filter_backends = (DjangoFilterBackend, RecipeOrderingFilter)
+    ordering_fields = ('pub_date', 'favorites_count', 'in_carts_count')
+    cache_scopes = ('recipes', 'tags', 'ingredients', 'users')
+    uncached_ordering = ('favorites_count', 'in_carts_count')
+    version_scopes = ('tags', 'ingredients', 'users')
+    list_version_scopes = ('recipes', 'recipe_counters')
 
     def get_serializer_class(self):
         """Возвращает сериализатор в зависимости от
@@ -64,13 +95,30 @@ class RecipeViewSet(ModelViewSet):
             return CreateRecipeSerializer
         return ReadRecipeSerializer
 
+    def get_serializer_context(self):
+        """ В списке карточки, на странице рецепта - крупное фото """
+
+        context = super().get_serializer_context()
+        if self.action != 'list':
+            context['image_variant'] = 'full'
+        return context
+
+    def get_queryset(self):
+        """Для чтения подгружаем связанные объекты и флаги
+        пользователя заранее, чтобы избежать N+1 запросов."""
+
+        if self.request.method in SAFE_METHODS:
+            return Recipe.objects.for_read()
+        return Recipe.objects.all()
+
     def add_to_base(self, request, model, pk):
         """ Функция добавления рецепта """
 
         recipe = get_object_or_404(Recipe, pk=pk)
-        _, created = model.objects.get_or_create(
-            recipe=recipe, user=request.user
-        )
+        with transaction.atomic():
+            _, created = model.objects.get_or_create(
+                recipe=recipe, user=request.user
+            )
         if created:
             serializer = RecipeShortSerializer(
                 recipe,
@@ -86,9 +134,10 @@ class RecipeViewSet(ModelViewSet):
         databse_obj = model.objects.filter(
             user=user, recipe=recipe
         )
-        if not databse_obj.exists():
+        with transaction.atomic():
+            deleted, _ = databse_obj.delete()
+        if not deleted:
             return Response(status=HTTP_400_BAD_REQUEST)
-        databse_obj.delete()
         return Response(status=HTTP_204_NO_CONTENT)
 
     @action(
@@ -121,10 +170,24 @@ class RecipeViewSet(ModelViewSet):
         methods=('get',),
         url_path='download_shopping_cart',
         detail=False,
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,),
+        content_negotiation_class=FileFormatContentNegotiation
     )
     def download_shopping_cart(self, request):
+        """ Функция вывода списка ингридиентов для покупки на печать.
+        Формат файла задаётся параметром ?format=txt|csv|json|pdf."""
+
+        return download_cart(request)
+
+
+class PerformanceView(APIView):
+    """ Статистика производительности эндпоинтов текущего процесса """
+
+    permission_classes = (IsAdminUser,)
 
-        """ Функция вывода списка ингридиентов для покупки на печать."""
-        user = request.user
-        return download_cart(user)
+    def get(self, request):
+        return Response({
+            'instrumentation': settings.PERF_INSTRUMENTATION,
+            'endpoints': endpoint_stats.snapshot(),
+            'response_cache': cache_stats(cached_viewset_names()),
+        })
@@ -0,0 +1,75 @@
+import random
+from contextvars import ContextVar
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+STICKY_KEY_PREFIX = 'db-primary'
+# Токены и сессии читаются с основной базы: только что выданный токен
+# может ещё не дойти до реплики
+PRIMARY_APPS = frozenset(('authtoken', 'sessions'))
+
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+class ReplicaRouter:
+    """ Чтение с реплик DB_REPLICA_HOSTS, если запрос разрешил это
+    через ReplicaReadsMiddleware; запись и миграции - в default """
+
+    def db_for_read(self, model, **hints):
+        if (
+            replica_reads.get()
+            and model._meta.app_label not in PRIMARY_APPS
+        ):
+            return random.choice(settings.DB_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def sticky_key(request):
+    """ Ключ клиента по токену или сессии, без запроса к базе """
+
+    credentials = request.META.get('HTTP_AUTHORIZATION') or (
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not credentials:
+        return None
+    return f'{STICKY_KEY_PREFIX}:{md5(credentials.encode()).hexdigest()}'
+
+
+class ReplicaReadsMiddleware:
+    """ GET и HEAD читают с реплик. После успешного изменения данных
+    клиент REPLICA_STICKY_SECONDS секунд читает с основной базы, чтобы
+    видеть свои изменения, пока реплики догоняют. Отметка хранится в
+    кэше, поэтому при нескольких воркерах нужен общий кэш (Redis). """
+
+    def __init__(self, get_response):
+        if not settings.DB_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = sticky_key(request)
+        safe = request.method in SAFE_METHODS
+        token = replica_reads.set(
+            safe and not (key and cache.get(key))
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        if key and not safe and response.status_code < 400:
+            cache.set(key, True, settings.REPLICA_STICKY_SECONDS)
+        return response
@@ -0,0 +1,35 @@
+from django.db.backends.postgresql import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """ PostgreSQL с проверкой постоянного соединения.
+
+    CONN_HEALTH_CHECKS появился только в Django 4.1; здесь тот же ключ
+    настроек базы и та же схема: соединение, оставшееся от прошлого
+    запроса, проверяется при первом курсоре в новом запросе и
+    закрывается, если сервер или PgBouncer уже разорвал его. Запросы,
+    которые не обращаются к базе, и базы, которые запрос не использует,
+    не проверяются.
+    """
+
+    health_check_done = False
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def _cursor(self, name=None):
+        if (
+            self.settings_dict.get('CONN_HEALTH_CHECKS')
+            and not self.health_check_done
+            and self.connection is not None
+            and not self.in_atomic_block
+        ):
+            if not self.is_usable():
+                self.close()
+            self.health_check_done = True
+        return super()._cursor(name)
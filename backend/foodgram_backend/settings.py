@@ -20,6 +20,7 @@ DJANGO = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
 ]
 
 API_FOODGRAM = [
@@ -39,6 +40,8 @@ EXTRA = [
 INSTALLED_APPS = DJANGO + API_FOODGRAM + EXTRA
 
 MIDDLEWARE = [
+    'api.instrumentation.PerformanceMiddleware',
+    'foodgram_backend.db.ReplicaReadsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,15 +75,81 @@ AUTH_USER_MODEL = 'users.User'
 
 DATABASES = {
      'default': {
-          'ENGINE': os.getenv('DB_ENGINE', default='django.db.backends.postgresql'),
+          'ENGINE': os.getenv('DB_ENGINE', default='foodgram_backend.postgresql'),
            'NAME': os.getenv('DB_NAME', default='postgres'),
            'USER': os.getenv('POSTGRES_USER', default='postgres'),
            'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
            'HOST': os.getenv('DB_HOST', default='localhost'),
-           'PORT': os.getenv('DB_PORT', default='5432')
+           'PORT': os.getenv('DB_PORT', default='5432'),
+           # Постоянные соединения: секунды жизни, 0 - закрывать после запроса
+           'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
+           # Проверка соединения при первом обращении в запросе,
+           # см. foodgram_backend.postgresql
+           'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', default='True') == 'True',
+           # Именованные курсоры iterator() несовместимы с PgBouncer
+           # в режиме pool_mode=transaction
+           'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DB_DISABLE_SERVER_SIDE_CURSORS', default='False') == 'True',
      }
 }
-  
+
+# Реплики для чтения: DB_REPLICA_HOSTS=host1,host2:5433. Для SQLite -
+# пути к файлам-копиям основной базы (локальная проверка маршрутизации)
+DB_REPLICAS = []
+
+for number, replica in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', default='').split(',')), 1):
+    if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+        location = {'NAME': replica.strip()}
+    else:
+        host, _, port = replica.strip().partition(':')
+        location = {'HOST': host, 'PORT': port or DATABASES['default']['PORT']}
+    DATABASES[f'replica{number}'] = {**DATABASES['default'], **location, 'TEST': {'MIRROR': 'default'}}
+    DB_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['foodgram_backend.db.ReplicaRouter']
+
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', default=10))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+RESPONSE_CACHE_ALIAS = 'default'
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', default=300))
+
+TAG_SLUGS_TIMEOUT = 300
+
+# Кэш избранного, корзины и подписок пользователя между запросами;
+# 0 - загружать в каждом запросе. С несколькими воркерами нужен общий кэш
+USER_RELATIONS_CACHE_TIMEOUT = int(os.getenv('USER_RELATIONS_CACHE_TIMEOUT', default=0))
+
+# Список рецептов из строк .values() без ReadRecipeSerializer (api.flat_list)
+FLAT_RECIPE_LIST = os.getenv('FLAT_RECIPE_LIST', default='True') == 'True'
+
+PERF_INSTRUMENTATION = os.getenv('PERF_INSTRUMENTATION', default='False') == 'True'
+
+PERF_WINDOW = 1000
+
+PERF_DUPLICATE_THRESHOLD = 3
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.performance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -152,6 +221,30 @@ LENGTH_MEASURE = 10
 MAX_COOKING_TIME = 1441
 
 MAX_INGREDIENT_AMOUNT = 32000
+## INGREDIENT SEARCH
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', default=300))
+
+INGREDIENT_INDEX_SPARSE_LIMIT = 10
+
+INGREDIENT_FUZZY_LIMIT = 20
+## RECIPE SEARCH
+SEARCH_INDEX_TTL = int(os.getenv('SEARCH_INDEX_TTL', default=60))
+## RECIPE IMAGES
+IMAGE_PIPELINE_WORKERS = int(os.getenv('IMAGE_PIPELINE_WORKERS', default=2))
+
+IMAGE_VARIANT_FORMAT = os.getenv('IMAGE_VARIANT_FORMAT', default='webp')
+
+IMAGE_UPLOAD_MAX_BYTES = int(
+    os.getenv('IMAGE_UPLOAD_MAX_BYTES', default=7 * 1024 * 1024)
+)
+
+IMAGE_UPLOAD_MAX_PIXELS = int(
+    os.getenv('IMAGE_UPLOAD_MAX_PIXELS', default=40_000_000)
+)
+## ASGI
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', default='False') == 'True'
+
+ASYNC_READ_THREADS = int(os.getenv('ASYNC_READ_THREADS', default=16))
 ## DATA PATHS
 INGREDIENTS_PATH = 'data/ingredients.json'
 
@@ -2,6 +2,7 @@ from django.contrib import admin
 
 from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
                      ShoppingCart, Tag)
+from .search import update_search_vectors
 
 
 class IngredientInline(admin.TabularInline):
@@ -14,14 +15,19 @@ class IngredientInline(admin.TabularInline):
 class RecipeAdmin(admin.ModelAdmin):
     list_display = ('author', 'name', 'cooking_time',
                     'get_favorites', 'get_ingredients',)
-    search_fields = ('name', 'author', 'tags')
+    search_fields = ('name', 'author__username', 'tags__name')
     list_filter = ('author', 'name', 'tags')
     inlines = (IngredientInline,)
     empty_value_display = '-пусто-'
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        update_search_vectors([form.instance.pk])
+
     def get_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
     get_favorites.short_description = 'Избранное'
+    get_favorites.admin_order_field = 'favorites_count'
 
     def get_ingredients(self, obj):
         return ', '.join([
@@ -0,0 +1,140 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_PATH = 'recipes/variants/'
+
+# Вариант: максимальная сторона в пикселях
+IMAGE_VARIANTS = {
+    'thumb': 160,
+    'card': 480,
+    'full': 1280,
+}
+
+# Формат файла: (формат PIL, параметры сохранения)
+IMAGE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=max(settings.IMAGE_PIPELINE_WORKERS, 1),
+            thread_name_prefix='recipe-images'
+        )
+    return _executor
+
+
+def save_content_addressed(data, extension):
+    """ Сохраняет файл под именем из хэша содержимого: одинаковые
+    картинки не дублируются, а nginx может кэшировать их бессрочно """
+
+    name = f'{VARIANTS_PATH}{sha256(data).hexdigest()[:32]}.{extension}'
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+    return name
+
+
+def render_variants(source):
+    """ Уменьшенные копии изображения без EXIF во всех форматах """
+
+    largest = max(IMAGE_VARIANTS.values())
+    with Image.open(source) as original:
+        # JPEG сразу декодируется в уменьшенном масштабе
+        original.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(original)
+        image = image.convert(
+            'RGBA' if 'A' in image.getbands() else 'RGB'
+        )
+    variants = {}
+    for variant, size in IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        variants[variant] = {}
+        for extension, (image_format, params) in IMAGE_FORMATS.items():
+            output = BytesIO()
+            frame = resized
+            if image_format == 'JPEG' and frame.mode != 'RGB':
+                frame = frame.convert('RGB')
+            frame.save(output, image_format, **params)
+            variants[variant][extension] = save_content_addressed(
+                output.getvalue(), extension
+            )
+    return variants
+
+
+def process_recipe_image(recipe_id, image_name):
+    """ Строит варианты изображения рецепта. Результат записывается,
+    только если за время обработки изображение не заменили. """
+
+    from .models import Recipe
+
+    try:
+        with default_storage.open(image_name, 'rb') as source:
+            variants = render_variants(source)
+        with transaction.atomic():
+            recipe = Recipe.objects.select_for_update().filter(
+                pk=recipe_id, image=image_name
+            ).first()
+            if recipe is not None:
+                recipe.image_variants = variants
+                recipe.save(update_fields=('image_variants',))
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', image_name)
+        return False
+    return True
+
+
+def process_in_worker(recipe_id, image_name):
+    """ Потоки пула держат свои соединения с базой: закрываем их,
+    как это делает Django в конце обычного запроса """
+
+    close_old_connections()
+    try:
+        return process_recipe_image(recipe_id, image_name)
+    finally:
+        close_old_connections()
+
+
+def schedule_image_processing(recipe):
+    """ Ставит обработку изображения в пул после фиксации транзакции.
+    При IMAGE_PIPELINE_WORKERS = 0 обработка идёт в текущем потоке. """
+
+    recipe_id, image_name = recipe.pk, recipe.image.name
+
+    def submit():
+        if settings.IMAGE_PIPELINE_WORKERS:
+            get_executor().submit(process_in_worker, recipe_id, image_name)
+        else:
+            process_recipe_image(recipe_id, image_name)
+
+    transaction.on_commit(submit)
+
+
+def variant_url(recipe, variant, extension):
+    """ URL варианта изображения или оригинала, пока варианты не готовы """
+
+    return stored_variant_url(
+        recipe.image.name, recipe.image_variants, variant, extension
+    )
+
+
+def stored_variant_url(image, variants, variant, extension):
+    """ То же по значениям полей image и image_variants, без модели """
+
+    name = (variants or {}).get(variant, {}).get(extension) or image
+    return default_storage.url(name) if name else None
@@ -0,0 +1,147 @@
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict, namedtuple
+from heapq import nsmallest
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+
+IndexedIngredient = namedtuple(
+    'IndexedIngredient', ('id', 'name', 'measurement_unit')
+)
+
+WORD = re.compile(r'\w+')
+# Порог сходства по умолчанию в pg_trgm (pg_trgm.similarity_threshold)
+TRIGRAM_THRESHOLD = 0.3
+
+
+def trigrams(text):
+    """ Триграммы как в pg_trgm: каждое слово в нижнем регистре
+    дополняется двумя пробелами слева и одним справа """
+
+    result = set()
+    for word in WORD.findall(text.lower()):
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class IngredientIndex:
+    """ Индекс ингредиентов в памяти: отсортированный массив
+    названий в нижнем регистре и бинарный поиск по префиксу. """
+
+    def __init__(self, ingredients):
+        entries = sorted(
+            (ingredient.name.lower(), ingredient)
+            for ingredient in ingredients
+        )
+        self.keys = [key for key, _ in entries]
+        self.items = [ingredient for _, ingredient in entries]
+        self.trigram_counts = []
+        self.trigram_postings = defaultdict(list)
+        for position, key in enumerate(self.keys):
+            grams = trigrams(key)
+            self.trigram_counts.append(len(grams))
+            for gram in grams:
+                self.trigram_postings[gram].append(position)
+
+    def __len__(self):
+        return len(self.items)
+
+    def starts_with(self, prefix):
+        """ Ингредиенты, название которых начинается с prefix """
+
+        if not prefix:
+            return list(self.items)
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(
+            self.keys, prefix[:-1] + chr(ord(prefix[-1]) + 1), start
+        )
+        return self.items[start:end]
+
+    def contains(self, fragment):
+        """ Ингредиенты, содержащие fragment не в начале названия,
+        ближайшие к началу вхождения идут первыми. """
+
+        matches = []
+        for key, item in zip(self.keys, self.items):
+            position = key.find(fragment)
+            if position > 0:
+                matches.append((position, key, item))
+        matches.sort(key=lambda match: match[:2])
+        return [item for _, _, item in matches]
+
+    def search(self, query):
+        """ Сначала совпадения по началу названия; если их мало,
+        к ним добавляются совпадения по вхождению. """
+
+        prefix = query.lower()
+        results = self.starts_with(prefix)
+        if prefix and len(results) < settings.INGREDIENT_INDEX_SPARSE_LIMIT:
+            results = results + self.contains(prefix)
+        return results
+
+    def fuzzy_search(self, query, limit):
+        """ Поиск с опечатками: совпадения по началу названия, затем
+        названия с триграммным сходством не ниже порога pg_trgm. """
+
+        results = self.starts_with(query.lower())[:limit]
+        grams = trigrams(query)
+        if len(results) == limit or not grams:
+            return results
+        found = {item.id for item in results}
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.trigram_postings.get(gram, ()))
+        scored = []
+        for position, count in shared.items():
+            similarity = count / (
+                len(grams) + self.trigram_counts[position] - count
+            )
+            if (similarity >= TRIGRAM_THRESHOLD
+                    and self.items[position].id not in found):
+                scored.append((-similarity, self.keys[position], position))
+        return results + [
+            self.items[position]
+            for _, _, position in nsmallest(limit - len(results), scored)
+        ]
+
+
+_index = None
+_built_at = 0.0
+_lock = Lock()
+
+
+def build_index():
+    from .models import Ingredient
+
+    return IngredientIndex(
+        IndexedIngredient(*row) for row in Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit'
+        )
+    )
+
+
+def get_ingredient_index():
+    """ Индекс текущего процесса. Строится при первом обращении и
+    перестраивается после сигнала об изменении ингредиентов или по
+    истечении INGREDIENT_INDEX_TTL (изменения в других процессах). """
+
+    global _index, _built_at
+    index = _index
+    if (
+        index is None
+        or monotonic() - _built_at > settings.INGREDIENT_INDEX_TTL
+    ):
+        with _lock:
+            if _index is index:
+                _index = build_index()
+                _built_at = monotonic()
+            index = _index
+    return index
+
+
+def invalidate_ingredient_index(**kwargs):
+    global _index
+    _index = None
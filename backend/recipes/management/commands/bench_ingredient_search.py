@@ -0,0 +1,117 @@
+from random import Random
+from statistics import mean, quantiles
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from recipes.ingredient_index import build_index
+from recipes.models import Ingredient
+
+ALPHABET = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+
+
+def timings_report(name, timings):
+    p95 = quantiles(timings, n=100)[94] if len(timings) > 1 else timings[0]
+    return (
+        f'{name:<8} mean {mean(timings) * 1000:8.3f} ms   '
+        f'p95 {p95 * 1000:8.3f} ms'
+    )
+
+
+def make_typo(random, word):
+    """ Одна опечатка: замена, пропуск или перестановка букв """
+
+    if len(word) < 4:
+        return word
+    position = random.randrange(1, len(word) - 1)
+    kind = random.choice(('replace', 'delete', 'swap'))
+    if kind == 'replace':
+        return word[:position] + random.choice(ALPHABET) + word[position + 1:]
+    if kind == 'delete':
+        return word[:position] + word[position + 1:]
+    return (word[:position] + word[position + 1] + word[position]
+            + word[position + 2:])
+
+
+class Command(BaseCommand):
+    help = ' Сравнить поиск ингредиентов в базе и в индексе в памяти '
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--target-ms', type=float, default=5.0,
+            help='Допустимый p95 нечёткого поиска в индексе'
+        )
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            self.stdout.write(self.style.ERROR(
+                'Нет ингредиентов, выполните load_data'
+            ))
+            return
+        random = Random(options['seed'])
+        prefixes = []
+        for _ in range(options['queries']):
+            name = random.choice(names)
+            prefixes.append(name[:random.randint(1, min(4, len(name)))])
+
+        started = perf_counter()
+        index = build_index()
+        build_time = perf_counter() - started
+
+        db_timings, index_timings = [], []
+        for prefix in prefixes:
+            started = perf_counter()
+            list(Ingredient.objects.filter(name__istartswith=prefix))
+            db_timings.append(perf_counter() - started)
+            started = perf_counter()
+            index.search(prefix)
+            index_timings.append(perf_counter() - started)
+
+        self.stdout.write(
+            f'Ингредиентов: {len(index)}, запросов: {len(prefixes)}, '
+            f'построение индекса {build_time * 1000:.1f} ms'
+        )
+        self.stdout.write(timings_report('db', db_timings))
+        self.stdout.write(timings_report('index', index_timings))
+        self.bench_fuzzy(names, index, random, options)
+
+    def bench_fuzzy(self, names, index, random, options):
+        """ Запросы с опечаткой: время и доля запросов, в ответе на
+        которые есть исходный ингредиент """
+
+        limit = settings.INGREDIENT_FUZZY_LIMIT
+        typos = []
+        for _ in range(options['queries']):
+            name = random.choice(names)
+            typos.append((name, make_typo(random, name)))
+
+        runners = [('fuzzy', lambda query: [
+            item.name for item in index.fuzzy_search(query, limit)
+        ])]
+        if connection.vendor == 'postgresql':
+            runners.append(('fuzzy db', lambda query: [
+                item.name for item in
+                Ingredient.objects.fuzzy_search(query, limit)
+            ]))
+        for label, run in runners:
+            timings, found = [], 0
+            for name, query in typos:
+                started = perf_counter()
+                found += name in run(query)
+                timings.append(perf_counter() - started)
+            self.stdout.write(
+                f'{timings_report(label, timings)}   '
+                f'recall {found / len(typos):.2%}'
+            )
+            if label == 'fuzzy':
+                p95 = quantiles(timings, n=100)[94] * 1000
+                if p95 > options['target_ms']:
+                    raise CommandError(
+                        f'p95 нечёткого поиска {p95:.2f} ms '
+                        f'превышает {options["target_ms"]} ms'
+                    )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import get_executor, process_in_worker
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ' Построить уменьшенные варианты изображений рецептов '
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Пересобрать и уже готовые варианты')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+        executor = get_executor()
+        results = list(executor.map(
+            lambda recipe: process_in_worker(*recipe),
+            recipes.values_list('pk', 'image').iterator()
+        ))
+        failed = results.count(False)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {len(results) - failed}, '
+            f'с ошибками: {failed}'
+        ))
@@ -1,28 +1,138 @@
 import json
+from hashlib import sha256
+from time import perf_counter
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
-from recipes.models import Ingredient, Tag
+from recipes.models import Ingredient, LoadedDataFile, Tag
+from recipes.signals import bulk_changed
+
+BATCH_SIZE = 1000
+READ_SIZE = 64 * 1024
+
+
+def iter_json_array(file):
+    """ Элементы JSON-массива по одному, без чтения файла целиком """
+
+    decoder = json.JSONDecoder()
+    buffer, position, started, eof = '', 0, False, False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer) and not started:
+            if buffer[position] != '[':
+                raise ValueError('Ожидается JSON-массив')
+            started, position = True, position + 1
+            continue
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file.read(READ_SIZE)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield item
+        position = end
+
+
+def file_hash(path):
+    digest = sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(READ_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 
 class Command(BaseCommand):
     help = ' Загрузить данные в модель ингредиентов '
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Сверить данные, даже если файл не изменился'
+        )
+
     def handle(self, *args, **options):
         self.stdout.write(self.style.WARNING('Старт команды'))
-        with open(settings.INGREDIENTS_PATH, encoding='utf-8',
-                  ) as data_file_ingredients:
-            ingredient_data = json.loads(data_file_ingredients.read())
-            Ingredient.objects.bulk_create(
-                Ingredient(**ingredients)
-                for ingredients in ingredient_data
+        for name, path, load in (
+            ('ingredients', settings.INGREDIENTS_PATH, self.load_ingredients),
+            ('tags', settings.TAGS_PATH, self.load_tags),
+        ):
+            started = perf_counter()
+            digest = file_hash(path)
+            loaded = LoadedDataFile.objects.filter(name=name).first()
+            if loaded and loaded.sha256 == digest and not options['force']:
+                self.stdout.write(f'{name}: файл не изменился, пропущено')
+                continue
+            try:
+                with open(path, encoding='utf-8') as file:
+                    with transaction.atomic():
+                        inserted, updated, unchanged = load(
+                            iter_json_array(file)
+                        )
+                        LoadedDataFile.objects.update_or_create(
+                            name=name, defaults={'sha256': digest}
+                        )
+            except (KeyError, TypeError, ValueError) as error:
+                raise CommandError(f'{path}: {error}')
+            self.stdout.write(
+                f'{name}: добавлено {inserted}, обновлено {updated}, '
+                f'без изменений {unchanged} '
+                f'({perf_counter() - started:.2f} с)'
             )
+        self.stdout.write(self.style.SUCCESS('Данные загружены'))
 
-        with open(settings.TAGS_PATH, encoding='utf-8',
-                  ) as data_file_tags:
-            tags_data = json.loads(data_file_tags.read())
-            for tags in tags_data:
-                Tag.objects.get_or_create(**tags)
+    def load_ingredients(self, items):
+        """ Все поля ингредиента входят в ключ уникальности, поэтому
+        обновлять нечего: добавляются только новые пары """
 
-        self.stdout.write(self.style.SUCCESS('Данные загружены'))
+        existing = set(
+            Ingredient.objects.values_list('name', 'measurement_unit')
+        )
+        inserted = unchanged = 0
+        batch = []
+        for item in items:
+            key = (item['name'], item['measurement_unit'])
+            if key in existing:
+                unchanged += 1
+                continue
+            existing.add(key)
+            batch.append(Ingredient(name=key[0], measurement_unit=key[1]))
+            if len(batch) == BATCH_SIZE:
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                inserted += len(batch)
+                batch = []
+        Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+        inserted += len(batch)
+        if inserted:
+            bulk_changed.send(sender=Ingredient)
+        return inserted, 0, unchanged
+
+    def load_tags(self, items):
+        """ Теги сверяются по slug: новые добавляются, у существующих
+        обновляются название и цвет. update_conflicts появился только
+        в Django 4.1, поэтому обновление - через bulk_update. """
+
+        existing = {tag.slug: tag for tag in Tag.objects.all()}
+        created, changed, unchanged = [], [], 0
+        for item in items:
+            tag = existing.get(item['slug'])
+            if tag is None:
+                tag = existing[item['slug']] = Tag(**item)
+                created.append(tag)
+            elif (tag.name, tag.color) != (item['name'], item['color']):
+                tag.name, tag.color = item['name'], item['color']
+                changed.append(tag)
+            else:
+                unchanged += 1
+        Tag.objects.bulk_create(created)
+        Tag.objects.bulk_update(changed, ('name', 'color'))
+        if created or changed:
+            bulk_changed.send(sender=Tag)
+        return len(created), len(changed), unchanged
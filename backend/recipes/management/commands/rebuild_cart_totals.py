@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Sum
+
+from recipes.models import IngredientRecipe, ShoppingCartTotals
+from users.models import User
+
+BATCH_SIZE = 1000
+
+
+def live_totals():
+    """ Суммы списков покупок, посчитанные заново по корзинам """
+
+    return IngredientRecipe.objects.filter(
+        recipe__shopping_cart__isnull=False
+    ).values(
+        'ingredient_id', user_id=F('recipe__shopping_cart__user')
+    ).annotate(total=Sum('amount')).order_by()
+
+
+def stored_totals():
+    return ShoppingCartTotals.objects.values(
+        'user_id', 'ingredient_id', 'total'
+    )
+
+
+def as_dict(rows):
+    return {
+        (row['user_id'], row['ingredient_id']): row['total']
+        for row in rows.iterator(chunk_size=BATCH_SIZE)
+    }
+
+
+class Command(BaseCommand):
+    help = ' Пересобрать и сверить суммы списков покупок '
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сверить таблицу с корзинами, не изменяя её'
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            self.rebuild()
+        expected = as_dict(live_totals())
+        stored = as_dict(stored_totals())
+        mismatched = {
+            key for key in {*expected, *stored}
+            if expected.get(key) != stored.get(key)
+        }
+        if mismatched:
+            for user_id, ingredient_id in sorted(mismatched)[:20]:
+                self.stdout.write(
+                    f'user={user_id} ingredient={ingredient_id}: '
+                    f'ожидается {expected.get((user_id, ingredient_id))}, '
+                    f'в таблице {stored.get((user_id, ingredient_id))}'
+                )
+            raise CommandError(f'Расхождений: {len(mismatched)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Суммы совпадают, строк: {len(stored)}'
+        ))
+
+    def rebuild(self):
+        with transaction.atomic():
+            ShoppingCartTotals.objects.all().delete()
+            batch = []
+            for row in live_totals().iterator(chunk_size=BATCH_SIZE):
+                batch.append(ShoppingCartTotals(**row))
+                if len(batch) == BATCH_SIZE:
+                    ShoppingCartTotals.objects.bulk_create(batch)
+                    batch = []
+            ShoppingCartTotals.objects.bulk_create(batch)
+            User.objects.update(
+                shopping_cart_revision=F('shopping_cart_revision') + 1
+            )
+        self.stdout.write(self.style.WARNING('Таблица пересобрана'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from recipes.models import Recipe
+from recipes.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = ' Пересчитать поисковые векторы рецептов '
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            update_search_vectors()
+            self.stdout.write(
+                'Полнотекстовый поиск недоступен, используется '
+                'индекс в памяти процесса'
+            )
+            return
+        ids = list(Recipe.objects.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(ids), options['batch_size']):
+            update_search_vectors(ids[start:start + options['batch_size']])
+        self.stdout.write(self.style.SUCCESS(
+            f'Векторы пересчитаны: {len(ids)}'
+        ))
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow, User
+
+
+def count_of(model, link):
+    """ Подзапрос с фактическим числом связанных строк """
+
+    return Coalesce(Subquery(
+        model.objects.filter(**{link: OuterRef('pk')}).order_by().values(
+            link
+        ).annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+# Модель: {поле счётчика: (связанная модель, поле связи)}
+COUNTERS = {
+    Recipe: {
+        'favorites_count': (Favorite, 'recipe'),
+        'in_carts_count': (ShoppingCart, 'recipe'),
+    },
+    User: {
+        'recipes_count': (Recipe, 'author'),
+        'followers_count': (Follow, 'author'),
+    },
+}
+
+
+class Command(BaseCommand):
+    help = ' Исправить расхождения денормализованных счётчиков '
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for model, counters in COUNTERS.items():
+            fixed = self.reconcile(model, counters, options['batch_size'])
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: исправлено {fixed}'
+            )
+        self.stdout.write(self.style.SUCCESS('Счётчики сверены'))
+
+    def reconcile(self, model, counters, batch_size):
+        """ Проходит таблицу пачками по pk. Каждая пачка исправляется
+        одним UPDATE, где фактические значения считаются подзапросами:
+        без чтения в Python не теряются инкременты F() из параллельных
+        запросов между чтением и записью """
+
+        unchanged = Q()
+        for field, related in counters.items():
+            unchanged &= Q(**{field: count_of(*related)})
+        fixed = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                model.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                return fixed
+            last_pk = pks[-1]
+            fixed += model.objects.filter(pk__in=pks).exclude(
+                unchanged
+            ).update(**{
+                field: count_of(*related)
+                for field, related in counters.items()
+            })
@@ -0,0 +1,35 @@
+# Generated by Django 3.2 on 2026-10-18 19:58
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+INDEX_NAME = 'ingredient_name_trgm'
+
+
+def create_trigram_index(apps, schema_editor):
+    """ GIN-индекс gin_trgm_ops есть только в PostgreSQL """
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    schema_editor.execute(
+        f'CREATE INDEX {INDEX_NAME} ON {Ingredient._meta.db_table} '
+        'USING gin (name gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2 on 2026-10-19 11:40
+
+from django.db import migrations
+from django.db.models import F, Sum
+
+BATCH_SIZE = 1000
+
+
+def fill_totals(apps, schema_editor):
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    ShoppingCartTotals = apps.get_model('recipes', 'ShoppingCartTotals')
+    ShoppingCartTotals.objects.all().delete()
+    totals = IngredientRecipe.objects.filter(
+        recipe__shopping_cart__isnull=False
+    ).values(
+        'ingredient_id', user_id=F('recipe__shopping_cart__user')
+    ).annotate(total=Sum('amount')).order_by()
+    ShoppingCartTotals.objects.bulk_create(
+        (ShoppingCartTotals(**row) for row in totals),
+        batch_size=BATCH_SIZE
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
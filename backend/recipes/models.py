@@ -1,14 +1,39 @@
 from django.conf import settings
+from django.contrib.postgres.search import (SearchVectorField,
+                                            TrigramSimilarity)
 from django.core.validators import (MaxValueValidator, MinValueValidator,
                                     RegexValidator,)
-from django.db.models import (CASCADE, CharField, DateTimeField, ForeignKey,
-                              ImageField, ManyToManyField, Model,
-                              PositiveSmallIntegerField, SlugField, TextField,
-                              UniqueConstraint)
+from django.db.models import (CASCADE, Case, CharField, DateTimeField, F,
+                              ForeignKey, ImageField, Index, IntegerField,
+                              JSONField, ManyToManyField, Model,
+                              PositiveIntegerField, PositiveSmallIntegerField,
+                              Prefetch, Q, QuerySet, SlugField, TextField,
+                              UniqueConstraint, Value, When, Window)
+from django.db.models.functions import RowNumber
 from colorfield.fields import ColorField
 from users.models import User
 
 
+class IngredientQuerySet(QuerySet):
+
+    def fuzzy_search(self, query, limit):
+        """Поиск с опечатками через pg_trgm: сначала совпадения по
+        началу названия, затем по убыванию триграммного сходства.
+        Оба условия обслуживает GIN-индекс gin_trgm_ops."""
+
+        return self.annotate(
+            prefix=Case(
+                When(name__startswith=query.lower(), then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField()
+            ),
+            similarity=TrigramSimilarity('name', query),
+        ).filter(
+            Q(name__startswith=query.lower())
+            | Q(name__trigram_similar=query)
+        ).order_by('-prefix', '-similarity', 'name')[:limit]
+
+
 class Ingredient(Model):
     """ Ингридиенты """
     name = CharField(
@@ -21,6 +46,8 @@ class Ingredient(Model):
         verbose_name='Еденица измерения'
     )
 
+    objects = IngredientQuerySet.as_manager()
+
     class Meta():
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
@@ -71,6 +98,55 @@ class Tag(Model):
         return self.name
 
 
+class RecipeQuerySet(QuerySet):
+    """ Запросы рецептов """
+
+    def with_related(self):
+        """Подгружает автора, теги и ингредиенты фиксированным
+        числом запросов, независимо от размера страницы."""
+
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredientforrecipe',
+                queryset=IngredientRecipe.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
+
+    def for_read(self):
+        """Полный план запросов для ReadRecipeSerializer. Поисковый
+        вектор нужен только в WHERE, в выборку он не попадает. Флаги
+        пользователя сериализатор берёт из api.relations."""
+
+        return self.with_related().defer('search_vector')
+
+    def top_per_author(self, author_ids, limit=None):
+        """Последние рецепты каждого автора одним запросом:
+        ROW_NUMBER() OVER (PARTITION BY author_id) с отсечкой по limit."""
+
+        if not author_ids:
+            return self.none()
+        ranked = self.filter(author_id__in=author_ids).annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('pub_date').desc(), F('id').desc())
+            )
+        ).order_by()
+        sql, params = ranked.query.sql_with_params()
+        where = ''
+        if limit is not None:
+            where = 'WHERE ranked.row_number <= %s '
+            params = (*params, limit)
+        return self.raw(
+            f'SELECT * FROM ({sql}) ranked {where}'
+            'ORDER BY ranked.author_id, ranked.row_number',
+            params
+        )
+
+
 class Recipe(Model):
     """ Рецепт """
     author = ForeignKey(
@@ -87,6 +163,12 @@ class Recipe(Model):
         upload_to='recipes/image/',
         verbose_name='Изображение'
     )
+    image_variants = JSONField(
+        verbose_name='Варианты изображения',
+        default=dict,
+        blank=True,
+        editable=False
+    )
     text = TextField(verbose_name='Описание')
     ingredients = ManyToManyField(
         Ingredient,
@@ -110,15 +192,59 @@ class Recipe(Model):
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    favorites_count = PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        db_index=True
+    )
+    in_carts_count = PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        db_index=True
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False
+    )
+    updated_at = DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+        db_index=True
+    )
+    revision = PositiveIntegerField(
+        verbose_name='Версия',
+        default=0,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx'
+            )
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """ Каждое сохранение - новая версия рецепта, в том числе
+        при save(update_fields=...) """
+
+        self.revision += 1
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {
+                *kwargs['update_fields'], 'revision', 'updated_at'
+            }
+        super().save(*args, **kwargs)
+
 
 class FavoritesShopCart(Model):
     """Вспогательная модель для избранного и списка покупок"""
@@ -215,3 +341,146 @@ class IngredientRecipe(Model):
             f'{self.ingredient.name} :: {self.ingredient.measurement_unit}'
             f' - {self.amount} '
         )
+
+
+class ShoppingCartTotalsQuerySet(QuerySet):
+    """ Инкрементальное обновление сумм списка покупок """
+
+    def apply_deltas(self, user_ids, deltas):
+        """Прибавляет deltas {ingredient_id: amount} к суммам
+        пользователей user_ids, удаляет обнулившиеся строки и поднимает
+        версию списка покупок, на которой построен его ETag."""
+
+        deltas = {
+            ingredient_id: delta
+            for ingredient_id, delta in deltas.items() if delta
+        }
+        user_ids = list(user_ids)
+        if not deltas or not user_ids:
+            return
+        self.bulk_create(
+            [
+                ShoppingCartTotals(
+                    user_id=user_id, ingredient_id=ingredient_id, total=0
+                )
+                for user_id in user_ids
+                for ingredient_id, delta in deltas.items() if delta > 0
+            ],
+            ignore_conflicts=True
+        )
+        rows = self.filter(user_id__in=user_ids, ingredient_id__in=deltas)
+        rows.update(total=F('total') + Case(
+            *(
+                When(ingredient_id=ingredient_id, then=Value(delta))
+                for ingredient_id, delta in deltas.items()
+            ),
+            output_field=IntegerField()
+        ))
+        rows.filter(total__lte=0).delete()
+        User.objects.filter(pk__in=user_ids).update(
+            shopping_cart_revision=F('shopping_cart_revision') + 1
+        )
+
+    def add_recipe(self, user_id, recipe_id):
+        self.apply_deltas([user_id], recipe_amounts(recipe_id))
+
+    def remove_recipe(self, user_id, recipe_id):
+        self.apply_deltas([user_id], {
+            ingredient_id: -amount
+            for ingredient_id, amount in recipe_amounts(recipe_id).items()
+        })
+
+    def change_recipe(self, recipe, old_amounts, new_amounts):
+        """Переносит изменение состава рецепта в списки покупок
+        всех пользователей, у которых он лежит в корзине."""
+
+        deltas = {
+            ingredient_id: (
+                new_amounts.get(ingredient_id, 0)
+                - old_amounts.get(ingredient_id, 0)
+            )
+            for ingredient_id in {*old_amounts, *new_amounts}
+        }
+        self.apply_deltas(
+            ShoppingCart.objects.filter(
+                recipe=recipe
+            ).values_list('user_id', flat=True),
+            deltas
+        )
+
+    def for_download(self, user):
+        return self.filter(user=user).values(
+            'total',
+            name=F('ingredient__name'),
+            units=F('ingredient__measurement_unit')
+        ).order_by('ingredient__name')
+
+
+def recipe_amounts(recipe):
+    """ Состав рецепта в виде {ingredient_id: amount} """
+
+    return dict(
+        IngredientRecipe.objects.filter(
+            recipe=recipe
+        ).values_list('ingredient_id', 'amount')
+    )
+
+
+class ShoppingCartTotals(Model):
+    """ Суммы ингредиентов списка покупок пользователя,
+    поддерживаются при изменении корзины и рецептов """
+
+    user = ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=CASCADE,
+        related_name='shopping_cart_totals'
+    )
+    ingredient = ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=CASCADE
+    )
+    total = IntegerField(
+        verbose_name='Количество',
+        default=0
+    )
+
+    objects = ShoppingCartTotalsQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Сумма списка покупок'
+        verbose_name_plural = 'Суммы списка покупок'
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_cart_totals'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} - {self.total} у {self.user}'
+
+
+class LoadedDataFile(Model):
+    """ Хэш последнего загруженного файла справочника """
+    name = CharField(
+        verbose_name='Справочник',
+        max_length=64,
+        unique=True
+    )
+    sha256 = CharField(
+        verbose_name='SHA-256 содержимого',
+        max_length=64
+    )
+    loaded_at = DateTimeField(
+        verbose_name='Загружен',
+        auto_now=True
+    )
+
+    class Meta:
+        verbose_name = 'Загруженный справочник'
+        verbose_name_plural = 'Загруженные справочники'
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,180 @@
+import re
+from collections import defaultdict
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import (Case, F, FloatField, OuterRef, Subquery,
+                              TextField, Value, When)
+
+SEARCH_CONFIG = 'russian'
+# Веса ts_rank по умолчанию для меток A (название), B (описание),
+# C (ингредиенты); запасной индекс считает ранг с теми же весами
+WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2}
+# Сколько лучших совпадений запасной индекс передаёт в запрос
+FALLBACK_LIMIT = 300
+
+WORD = re.compile(r'\w+')
+STOP_WORDS = frozenset((
+    'а', 'без', 'в', 'во', 'да', 'для', 'до', 'же', 'за', 'и', 'из', 'или',
+    'к', 'как', 'ко', 'на', 'над', 'не', 'но', 'о', 'об', 'от', 'по',
+    'под', 'при', 'про', 'с', 'со', 'то', 'у',
+))
+RUSSIAN_ENDINGS = sorted((
+    'а', 'ам', 'ами', 'ах', 'ая', 'е', 'ев', 'ее', 'ей', 'ем', 'его', 'ему',
+    'ет', 'ешь', 'и', 'ие', 'ий', 'им', 'ими', 'их', 'ию', 'ия', 'о', 'ов',
+    'ого', 'ое', 'ой', 'ом', 'ому', 'у', 'ут', 'ую', 'ы', 'ые', 'ый', 'ым',
+    'ыми', 'ых', 'ь', 'ью', 'ю', 'ют', 'я', 'ям', 'ями', 'ях', 'ать', 'ять',
+    'ить', 'еть', 'ся', 'ться',
+), key=len, reverse=True)
+
+
+def recipe_search_vector():
+    """ Вектор рецепта: название, описание и названия ингредиентов """
+
+    from .models import IngredientRecipe
+
+    ingredient_names = Subquery(
+        IngredientRecipe.objects.filter(
+            recipe_id=OuterRef('pk')
+        ).order_by().values('recipe_id').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names'),
+        output_field=TextField()
+    )
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+        + SearchVector(ingredient_names, weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(recipe_ids=None):
+    """ Пересчитывает search_vector рецептов одним UPDATE. Без
+    PostgreSQL сбрасывает запасной индекс текущего процесса. """
+
+    from .models import Recipe
+
+    if connection.vendor != 'postgresql':
+        invalidate_search_index()
+        return
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=list(recipe_ids))
+    recipes.update(search_vector=recipe_search_vector())
+
+
+def search_recipes(queryset, text):
+    """ Рецепты по запросу, лучшие совпадения первыми """
+
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(
+            text, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        queryset = queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        )
+    else:
+        scores = get_search_index().search(text)
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        ranked = ranked[:FALLBACK_LIMIT]
+        if not ranked:
+            return queryset.none()
+        queryset = queryset.filter(pk__in=ranked).annotate(
+            search_rank=Case(
+                *(When(pk=pk, then=Value(scores[pk])) for pk in ranked),
+                output_field=FloatField()
+            )
+        )
+    return queryset.order_by('-search_rank', '-pub_date', '-id')
+
+
+def stem(word):
+    """ Грубое отсечение русских окончаний для запасного индекса """
+
+    for ending in RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(text):
+    return [
+        stem(word) for word in WORD.findall(text.lower().replace('ё', 'е'))
+        if word not in STOP_WORDS
+    ]
+
+
+class RecipeSearchIndex:
+    """ Инвертированный индекс рецептов в памяти для баз без
+    полнотекстового поиска (SQLite в тестах и локальной разработке) """
+
+    def __init__(self, documents):
+        self.postings = defaultdict(dict)
+        for recipe_id, label, text in documents:
+            for term in tokenize(text):
+                scores = self.postings[term]
+                scores[recipe_id] = scores.get(recipe_id, 0) + WEIGHTS[label]
+
+    def search(self, text):
+        """ {id рецепта: ранг} для рецептов со всеми словами запроса """
+
+        results = None
+        for term in set(tokenize(text)):
+            scores = self.postings.get(term, {})
+            if results is None:
+                results = dict(scores)
+            else:
+                results = {
+                    recipe_id: results[recipe_id] + scores[recipe_id]
+                    for recipe_id in results.keys() & scores.keys()
+                }
+            if not results:
+                break
+        return results or {}
+
+
+_index = None
+_built_at = 0.0
+_lock = Lock()
+
+
+def build_index():
+    from .models import IngredientRecipe, Recipe
+
+    def documents():
+        for recipe_id, name, text in Recipe.objects.values_list(
+            'id', 'name', 'text'
+        ).iterator():
+            yield recipe_id, 'A', name
+            yield recipe_id, 'B', text
+        for recipe_id, name in IngredientRecipe.objects.values_list(
+            'recipe_id', 'ingredient__name'
+        ).iterator():
+            yield recipe_id, 'C', name
+
+    return RecipeSearchIndex(documents())
+
+
+def get_search_index():
+    """ Индекс текущего процесса, перестраивается после изменений
+    рецептов или по истечении SEARCH_INDEX_TTL """
+
+    global _index, _built_at
+    index = _index
+    if index is None or monotonic() - _built_at > settings.SEARCH_INDEX_TTL:
+        with _lock:
+            if _index is index:
+                _index = build_index()
+                _built_at = monotonic()
+            index = _index
+    return index
+
+
+def invalidate_search_index(**kwargs):
+    global _index
+    _index = None
@@ -0,0 +1,86 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from users.models import Follow, User
+from .ingredient_index import invalidate_ingredient_index
+from .search import update_search_vectors
+from .models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                     ShoppingCartTotals)
+
+# Модель связи: (модель со счётчиком, поле связи, поле счётчика)
+COUNTERS = {
+    Favorite: (Recipe, 'recipe_id', 'favorites_count'),
+    ShoppingCart: (Recipe, 'recipe_id', 'in_carts_count'),
+    Recipe: (User, 'author_id', 'recipes_count'),
+    Follow: (User, 'author_id', 'followers_count'),
+}
+
+# Отправляется после массовых изменений (bulk_create, bulk_update),
+# которые обходят post_save; sender - изменённая модель
+bulk_changed = Signal()
+
+
+@receiver((post_save, post_delete, bulk_changed), sender=Ingredient)
+def ingredient_changed(**kwargs):
+    """ Сброс индекса ингредиентов после фиксации транзакции: иначе
+    другой поток может успеть перестроить его по старым данным """
+
+    transaction.on_commit(invalidate_ingredient_index)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(instance, created, **kwargs):
+    """ Название ингредиента входит в поисковые векторы рецептов """
+
+    if not created:
+        update_search_vectors(
+            Recipe.objects.filter(ingredients=instance).values_list(
+                'pk', flat=True
+            )
+        )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def cart_recipe_added(instance, created, **kwargs):
+    """ Рецепт в корзине - прибавляем его к суммам списка покупок """
+
+    if created:
+        ShoppingCartTotals.objects.add_recipe(
+            instance.user_id, instance.recipe_id
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def cart_recipe_removed(instance, **kwargs):
+    """ Вычитаем рецепт из сумм до удаления строки корзины: при каскадном
+    удалении рецепта его ингредиенты ещё на месте """
+
+    ShoppingCartTotals.objects.remove_recipe(
+        instance.user_id, instance.recipe_id
+    )
+
+
+def update_counter(sender, instance, delta):
+    """ Атомарное изменение денормализованного счётчика через F() """
+
+    model, link, field = COUNTERS[sender]
+    model.objects.filter(pk=getattr(instance, link)).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def counted_object_saved(sender, instance, created, **kwargs):
+    if created:
+        update_counter(sender, instance, 1)
+
+
+def counted_object_deleted(sender, instance, **kwargs):
+    update_counter(sender, instance, -1)
+
+
+for counted_model in COUNTERS:
+    post_save.connect(counted_object_saved, sender=counted_model)
+    post_delete.connect(counted_object_deleted, sender=counted_model)
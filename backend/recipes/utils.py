@@ -0,0 +1,12 @@
+def bulk_create_with_ids(model, objects, batch_size=None):
+    """ bulk_create с проставленными pk. SQLite в Django 3.2 не
+    возвращает id вставленных строк, поэтому берём последние id. """
+
+    objects = model.objects.bulk_create(objects, batch_size=batch_size)
+    if objects and objects[-1].pk is None:
+        ids = model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        )[:len(objects)]
+        for obj, pk in zip(objects, reversed(list(ids))):
+            obj.pk = pk
+    return objects
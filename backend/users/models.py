@@ -2,7 +2,8 @@ from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db.models import (CASCADE, CharField, EmailField, ForeignKey,
-                              Model, UniqueConstraint, CheckConstraint, F, Q)
+                              Model, PositiveIntegerField, UniqueConstraint,
+                              CheckConstraint, F, Q)
 
 
 class User(AbstractUser):
@@ -28,6 +29,19 @@ class User(AbstractUser):
         unique=True,
         validators=(UnicodeUsernameValidator(), )
     )
+    recipes_count = PositiveIntegerField(
+        verbose_name='Рецептов',
+        default=0
+    )
+    followers_count = PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0
+    )
+    shopping_cart_revision = PositiveIntegerField(
+        verbose_name='Версия списка покупок',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ('username', )
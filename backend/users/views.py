@@ -1,16 +1,24 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Value
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import IntegerField
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
 from .models import User, Follow
+from recipes.models import Recipe
+from api.instrumentation import InstrumentedViewMixin
 from api.pagination import CustomPagination
 from api.serializers import SubscribeListSerializer, CustomUserSerializer
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(InstrumentedViewMixin, UserViewSet):
     """ Вьюсет пользователя """
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
@@ -29,26 +37,60 @@ class CustomUserViewSet(UserViewSet):
 
         if request.method == 'POST':
             serializer = SubscribeListSerializer(
-                author, data=request.data, context={'request': request}
+                author, data=request.data, context={
+                    'request': request,
+                    'recipes_limit': self.get_recipes_limit(),
+                }
             )
             serializer.is_valid(raise_exception=True)
-            Follow.objects.create(user=user, author=author)
+            with transaction.atomic():
+                Follow.objects.create(user=user, author=author)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
-            get_object_or_404(
-                Follow, user=user, author=author
-            ).delete()
+            with transaction.atomic():
+                get_object_or_404(
+                    Follow, user=user, author=author
+                ).delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
         """ Функция вывода листа подписок """
 
-        user = request.user
-        queryset = User.objects.filter(following__user=user)
+        recipes_limit = self.get_recipes_limit()
+        queryset = User.objects.filter(
+            following__user=request.user
+        ).annotate(is_subscribed=Value(True)).order_by('username')
         pages = self.paginate_queryset(queryset)
+        self.attach_recipes(pages, recipes_limit)
         serializer = SubscribeListSerializer(
-            pages, many=True, context={'request': request}
+            pages, many=True, context={
+                'request': request,
+                'recipes_limit': recipes_limit,
+            }
         )
         return self.get_paginated_response(serializer.data)
+
+    def get_recipes_limit(self):
+        """ Проверка recipes_limit до выполнения запросов """
+
+        limit = self.request.query_params.get('recipes_limit')
+        if limit is None:
+            return None
+        try:
+            return IntegerField(min_value=0).run_validation(limit)
+        except ValidationError as error:
+            raise ValidationError({'recipes_limit': error.detail})
+
+    @staticmethod
+    def attach_recipes(authors, limit):
+        """ Рецепты всех авторов страницы одним оконным запросом """
+
+        recipes = defaultdict(list)
+        for recipe in Recipe.objects.top_per_author(
+            [author.id for author in authors], limit
+        ):
+            recipes[recipe.author_id].append(recipe)
+        for author in authors:
+            author.limited_recipes = recipes[author.id]